@@ -0,0 +1,314 @@
+"""Run a command over many exercises in a single process."""
+
+from __future__ import annotations
+
+import time
+from subprocess import CalledProcessError
+from typing import Callable, Optional
+
+import common
+import index
+import timing
+from exercise import Exercise
+
+
+class Result:
+    """Outcome of running a command for a single exercise."""
+
+    def __init__(self, exercise: Exercise, command: str, passed: bool,
+                 duration: float, error: Optional[str] = None,
+                 cached: bool = False, exit_status: Optional[int] = None,
+                 tests: Optional[common.TestCounts] = None,
+                 memory: Optional[common.MemoryErrors] = None):
+        """Create result.
+
+        :param exercise: exercise the command ran for
+        :param command: name of the command
+        :param passed: whether the command succeeded
+        :param duration: wall time of the command in seconds
+        :param error: reason of failure
+        :param cached: whether the command was skipped as up to date
+        :param exit_status: exit status of the failed process, if known
+        :param tests: counts of tests parsed from the tool output
+        :param memory: memory errors parsed from the checker output
+        """
+        self.exercise = exercise
+        self.command = command
+        self.passed = passed
+        self.duration = duration
+        self.error = error
+        self.cached = cached
+        self.exit_status = exit_status
+        self.tests = tests
+        self.memory = memory
+
+
+Action = Callable[[Exercise], None]
+Listener = Callable[[Result], None]
+
+
+def run(command: common.Command, exercises: list[Exercise],
+        jobs: int = 1, action: Optional[Action] = None,
+        on_result: Optional[Listener] = None) -> list[Result]:
+    """Run the command for all exercises, continuing after failures.
+
+    With more than one job, output lines of each exercise are prefixed with
+    the exercise name as they come.
+
+    :param command: command to run
+    :param exercises: exercises to run the command for
+    :param jobs: maximum number of exercises to run concurrently
+    :param action: step to run instead of the whole command
+    :param on_result: called with each result as soon as it is ready,
+                      possibly from another thread
+    :return: result for each exercise in order
+    """
+    if not action and command.can_run_many() and len(exercises) > 1:
+        results = run_many(command, exercises)
+        if on_result:
+            for result in results:
+                on_result(result)
+        return results
+    jobs = min(jobs, command.max_jobs() or jobs, len(exercises))
+    if jobs <= 1:
+        results = []
+        for exercise in exercises:
+            print(_header(exercise), flush=True)
+            results.append(run_one(command, exercise, action))
+            if on_result:
+                on_result(results[-1])
+        return results
+
+    width = max(len(str(x)) for x in exercises)
+    # Processes of the workers run in their own process groups, which the
+    # terminal does not interrupt, so they are cancelled together instead.
+    scope = common.get_cancel_scope() or common.CancelScope()
+
+    def run_prefixed(exercise: Exercise) -> Result:
+        with common.prefix_output(f'{str(exercise):<{width}} | '), scope:
+            result = run_one(command, exercise, action)
+        if on_result:
+            on_result(result)
+        return result
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            return list(executor.map(run_prefixed, exercises))
+        except KeyboardInterrupt:
+            # Workers are waited for on shutdown, so stop them first.
+            scope.cancel()
+            executor.shutdown(cancel_futures=True)
+            raise
+
+
+def run_many(command: common.Command,
+             exercises: list[Exercise]) -> list[Result]:
+    """Run the command for all exercises with a single call.
+
+    :param command: command that can run many exercises
+    :param exercises: exercises to run the command for
+    :return: result for each exercise in order
+    """
+    start = time.monotonic()
+
+    def ensure_downloaded(exercise: Exercise) -> None:
+        if command.needs_download() and not exercise.is_downloaded():
+            common.DownloadCommand().run(exercise)
+
+    downloads = {id(x): run_one(command, x, ensure_downloaded)
+                 for x in exercises}
+    ready = [x for x in exercises if downloads[id(x)].passed]
+    digests = {id(x): get_digest(command, x) for x in ready}
+    stale = [x for x in ready if not is_up_to_date(command, x,
+                                                   digests[id(x)])]
+    exit_status: Optional[int] = None
+    with timing.span(command.name, 'command'), \
+            common.collect_tests() as tests, \
+            common.collect_exit_statuses() as exit_statuses:
+        try:
+            errors = dict(zip([id(x) for x in stale],
+                              command.run_many(stale) if stale else []))
+        except common.EXERCISE_ERRORS as e:
+            # The single call failed as a whole, so do all of its exercises.
+            errors = dict.fromkeys([id(x) for x in stale],
+                                   common.describe_error(e))
+            if isinstance(e, CalledProcessError):
+                exit_status = e.returncode
+    duration = time.monotonic() - start
+    results = []
+    for exercise in exercises:
+        result = downloads[id(exercise)]
+        if result.passed:
+            cached = id(exercise) not in errors
+            error = None if cached else errors[id(exercise)]
+            if not cached:
+                _record(command, exercise, digests[id(exercise)],
+                        error is None)
+            counts = tests.get(id(exercise))
+            if cached:
+                seconds = 0.0
+            elif counts and counts.duration is not None:
+                # Share of the exercise in the single call, as timed by the
+                # test tool.
+                seconds = counts.duration
+            else:
+                seconds = duration
+            status = exit_statuses.get(id(exercise), exit_status)
+            result = Result(exercise=exercise,
+                            command=command.name,
+                            passed=error is None,
+                            duration=seconds,
+                            error=error,
+                            cached=cached,
+                            exit_status=0 if error is None else status,
+                            tests=counts)
+        results.append(result)
+    return results
+
+
+def run_one(command: common.Command, exercise: Exercise,
+            action: Optional[Action] = None) -> Result:
+    """Run the command for a single exercise, capturing its failure.
+
+    :param command: command to run
+    :param exercise: exercise to run the command for
+    :param action: step to run instead of the whole command
+    """
+    start = time.monotonic()
+    error: Optional[str] = None
+    exit_status: Optional[int] = None
+    cached = False
+    try:
+        with common.collect_tests() as tests, \
+                common.collect_memory() as memory:
+            if action:
+                action(exercise)
+            else:
+                if command.needs_download() and \
+                        not exercise.is_downloaded():
+                    common.DownloadCommand().run(exercise)
+                cached = run_incremental(command, exercise)
+    except common.EXERCISE_ERRORS as e:
+        error = common.describe_error(e)
+        if isinstance(e, CalledProcessError):
+            exit_status = e.returncode
+    return Result(exercise=exercise,
+                  command=command.name,
+                  passed=error is None,
+                  duration=time.monotonic() - start,
+                  error=error,
+                  cached=cached,
+                  exit_status=0 if error is None else exit_status,
+                  tests=tests.get(id(exercise)),
+                  memory=memory.get(id(exercise)))
+
+
+def run_incremental(command: common.Command, exercise: Exercise) -> bool:
+    """Run the command unless its inputs did not change since it passed.
+
+    :param command: command to run
+    :param exercise: downloaded exercise to run the command for
+    :return: whether running the command was skipped
+    """
+    digest = get_digest(command, exercise)
+    if is_up_to_date(command, exercise, digest):
+        return True
+    try:
+        with timing.span(command.name, 'command'):
+            command.run(exercise)
+    except BaseException:
+        _record(command, exercise, digest, False)
+        raise
+    _record(command, exercise, digest, True)
+    return False
+
+
+def get_digest(command: common.Command,
+               exercise: Exercise) -> Optional[str]:
+    """Return digest of command inputs, or None if it is not incremental.
+
+    :param command: command to run
+    :param exercise: downloaded exercise to run the command for
+    """
+    with timing.span(command.name, 'digest'):
+        inputs = command.get_inputs(exercise)
+        if inputs is None:
+            return None
+        return common.digest_files(inputs, command.name,
+                                   command.get_fingerprint(exercise))
+
+
+def is_up_to_date(command: common.Command, exercise: Exercise,
+                  digest: Optional[str]) -> bool:
+    """Return whether the command passed before with the same inputs.
+
+    :param command: command to run
+    :param exercise: downloaded exercise to run the command for
+    :param digest: digest of the command inputs
+    """
+    if not digest or exercise.namespace.force:
+        return False
+    result = index.get_index().get_result(exercise, command.name)
+    if result != (digest, True):
+        return False
+    common.echo(f'{exercise}: {command} is up to date, '
+                'use --force to run again')
+    return True
+
+
+def _record(command: common.Command, exercise: Exercise,
+            digest: Optional[str], passed: bool) -> None:
+    if digest and (passed or command.records_failures()):
+        index.get_index().add_result(exercise, command.name, digest, passed)
+
+
+def download(command: common.DownloadCommand, exercises: list[Exercise],
+             jobs: int) -> list[Result]:
+    """Download exercises in two stages.
+
+    All exercises are fetched from Exercism first, skipping the ones already
+    in the local index. Post download hooks run in a second stage after all
+    fetches are finished.
+
+    :param command: download command
+    :param exercises: exercises to download
+    :param jobs: maximum number of concurrent fetches and hooks
+    :return: result for each exercise in order
+    """
+    fetched = run(command, exercises, jobs, command.fetch)
+    prepared = run(command, [x.exercise for x in fetched if x.passed], jobs,
+                   lambda x: x.post_download())
+    results = {id(x.exercise): x for x in fetched}
+    for result in prepared:
+        result.duration += results[id(result.exercise)].duration
+        results[id(result.exercise)] = result
+    return list(results.values())
+
+
+def _header(exercise: Exercise) -> str:
+    return f'==> {exercise.track}/{exercise}'
+
+
+def print_summary(results: list[Result]) -> None:
+    """Print pass/fail status of every exercise and the totals.
+
+    :param results: results of a batch run
+    """
+    lines = ['', 'summary:']
+    for result in results:
+        status = ('SKIP' if result.cached else
+                  'PASS' if result.passed else 'FAIL')
+        line = f'  {status}  {result.exercise}  ({result.duration:.1f}s)'
+        if result.error:
+            line += f'  {result.error}'
+        memory = result.memory
+        if memory and (memory.total or memory.leaked_blocks):
+            line += f'  ({memory})'
+        lines.append(line)
+    failed = sum(1 for x in results if not x.passed)
+    cached = sum(1 for x in results if x.cached)
+    passed = len(results) - failed - cached
+    lines.append(f'{passed} passed, {failed} failed'
+                 f'{f", {cached} up to date" if cached else ""}')
+    print('\n'.join(lines))
@@ -0,0 +1,433 @@
+"""Benchmarks for hot paths of the script.
+
+Benchmarks run offline. A stub exercism executable is put on PATH and
+exercises are generated in temporary workspaces.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import batch
+import common
+import index
+import track_c
+import track_python
+import track_rust
+import workspace
+from exercise import Exercise
+
+Benchmark = Callable[[int], Callable[[], object]]
+
+_BENCHMARKS: dict[str, tuple[Benchmark, list[int]]] = {}
+
+_WORKSPACE_SIZES = [10, 100, 1000]
+
+# Prints the workspace from the CLI config like the real one, logs submitted
+# files next to the config and succeeds on anything else.
+_STUB_EXERCISM = """#!/bin/sh
+if [ "$1" = workspace ]; then
+    sed -n 's/.*"workspace": *"\\([^"]*\\)".*/\\1/p' \\
+        "$EXERCISM_CONFIG_HOME/user.json"
+elif [ "$1" = submit ]; then
+    shift
+    echo "$@" >> "$EXERCISM_CONFIG_HOME/submissions.log"
+fi
+"""
+
+_LAUNCH_TEMPLATE = {'configurations': [{'name': 'Debug',
+                                        'cargo': {'args': ['test']}}]}
+
+# Directory holding stub executables and generated workspaces.
+_scratch_dir: Optional[Path] = None
+
+# Modules that should not be imported to run a C track command. Slow modules
+# needed only by some commands, or only for some options, are imported in the
+# functions using them, and listed here so that startup stays fast.
+_STARTUP_FORBIDDEN = ['cProfile', 'concurrent.futures', 'dataclasses',
+                      'inspect', 'toml', 'track_python', 'track_rust']
+
+
+def benchmark(name: str, sizes: Optional[list[int]] = None
+              ) -> Callable[[Benchmark], Benchmark]:
+    """Register a benchmark.
+
+    A benchmark takes a problem size, prepares its input and returns the
+    operation to measure.
+
+    :param name: name of the benchmark
+    :param sizes: default problem sizes
+    """
+    def register(function: Benchmark) -> Benchmark:
+        _BENCHMARKS[name] = (function, sizes or [100, 1000, 10000])
+        return function
+    return register
+
+
+@benchmark('c-header-parse')
+def bench_c_header_parse(size: int) -> Callable[[], object]:
+    """Parse a synthetic header with the given number of declarations."""
+    source = make_c_header(size)
+    return lambda: track_c.parse_functions(source)
+
+
+@benchmark('exercise-properties', sizes=_WORKSPACE_SIZES)
+def bench_exercise_properties(size: int) -> Callable[[], object]:
+    """Create exercises of a workspace and read their properties."""
+    track = track_python.PythonTrack()
+    names = make_workspace(track, size)
+    namespace = make_namespace()
+
+    def run() -> None:
+        for name in names:
+            exercise = Exercise(track, namespace, name)
+            for _ in (exercise.path, exercise.root, exercise.blurb,
+                      exercise.url, exercise.solution_files,
+                      exercise.test_files, exercise.is_downloaded()):
+                pass
+    return run
+
+
+@benchmark('exercise-config', sizes=_WORKSPACE_SIZES)
+def bench_exercise_config(size: int) -> Callable[[], object]:
+    """Look up config values of all exercises of a workspace."""
+    track = track_python.PythonTrack()
+    namespace = make_namespace()
+    exercises = [Exercise(track, namespace, x)
+                 for x in make_workspace(track, size)]
+    keys = [('config.json', ['files', 'solution']),
+            ('config.json', ['files', 'test']),
+            ('config.json', ['blurb']),
+            ('metadata.json', ['exercise']),
+            ('metadata.json', ['url'])]
+
+    def run() -> None:
+        for exercise in exercises:
+            for config_file, path in keys:
+                exercise._get_config(config_file, path)
+    return run
+
+
+@benchmark('index-query', sizes=_WORKSPACE_SIZES)
+def bench_index_query(size: int) -> Callable[[], object]:
+    """Refresh the index of a workspace and list all of its exercises."""
+    make_workspace(track_python.PythonTrack(), size)
+
+    def run() -> object:
+        exercises = index.get_index()
+        exercises.refresh(workspace.get_root())
+        return exercises.query()
+    return run
+
+
+@benchmark('submit-unchanged', sizes=_WORKSPACE_SIZES)
+def bench_submit_unchanged(size: int) -> Callable[[], object]:
+    """Check all exercises of a workspace for changes since submission.
+
+    Exercises are submitted once through the stub CLI beforehand, and
+    messages of skipped submissions are discarded.
+    """
+    track = track_python.PythonTrack()
+    namespace = make_namespace()
+    exercises = [Exercise(track, namespace, x)
+                 for x in make_workspace(track, size)]
+    command = common.SubmitCommand()
+    for exercise in exercises:
+        batch.run_incremental(command, exercise)
+
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for exercise in exercises:
+                assert batch.run_incremental(command, exercise)
+    return run
+
+
+@benchmark('c-init', sizes=_WORKSPACE_SIZES)
+def bench_c_init(size: int) -> Callable[[], object]:
+    """Enable tests and generate stubs for all exercises of a workspace.
+
+    Solution and test files are restored before each run.
+    """
+    return _bench_init(track_c.CTrack(), track_c.InitCommand(), size)
+
+
+@benchmark('rust-init', sizes=_WORKSPACE_SIZES)
+def bench_rust_init(size: int) -> Callable[[], object]:
+    """Add all exercises of a workspace to the cargo workspace.
+
+    Exercise files, manifests and init state are restored before each run.
+    """
+    return _bench_init(track_rust.RustTrack(), track_rust.InitCommand(),
+                       size)
+
+
+@benchmark('python-init', sizes=_WORKSPACE_SIZES)
+def bench_python_init(size: int) -> Callable[[], object]:
+    """Insert docstrings to all exercises of a workspace.
+
+    Solution files are restored before each run.
+    """
+    return _bench_init(track_python.PythonTrack(),
+                       track_python.InitCommand(), size)
+
+
+def _bench_init(track: common.Track, command: common.Command,
+                size: int) -> Callable[[], object]:
+    namespace = make_namespace()
+    exercises = [Exercise(track, namespace, x)
+                 for x in make_workspace(track, size)]
+    root = exercises[0].root
+    files = {x: x.read_text() for e in exercises
+             for x in e.solution_files + e.test_files}
+    generated = [root / 'Cargo.toml', root / '.vscode' / 'launch.json']
+
+    def run() -> None:
+        for file, content in files.items():
+            file.write_text(content)
+        for file in generated:
+            file.unlink(missing_ok=True)
+        shutil.rmtree(root / '.manage', ignore_errors=True)
+        for exercise in exercises:
+            command.run(exercise)
+    return run
+
+
+@benchmark('cli-startup', sizes=[1, 10])
+def bench_cli_startup(size: int) -> Callable[[], object]:
+    """Start the script for the C track the given number of times.
+
+    Fails if startup imports modules that a C track command does not need.
+    """
+    args = [sys.executable, '-X', 'importtime',
+            str(Path(__file__).parent / 'manage.py'),
+            '--track=c', '--exercise=hello-world', 'info', '--help']
+
+    def run() -> None:
+        for _ in range(size):
+            process = subprocess.run(args, text=True,
+                                     stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.PIPE)
+            check_imports(process.stderr)
+    return run
+
+
+def check_imports(importtime: str) -> None:
+    """Raise AssertionError if a forbidden module was imported.
+
+    >>> check_imports('import time: 10 | 20 |   toml.decoder')
+    >>> check_imports('import time: 10 | 20 | toml')
+    Traceback (most recent call last):
+    ...
+    AssertionError: startup imports toml
+
+    :param importtime: output of python -X importtime
+    """
+    modules = {x.rsplit('|', 1)[-1].strip() for x in importtime.splitlines()
+               if x.startswith('import time:')}
+    imported = [x for x in _STARTUP_FORBIDDEN if x in modules]
+    assert not imported, f'startup imports {", ".join(imported)}'
+
+
+def make_c_header(size: int) -> str:
+    """Return a C header with the given number of function declarations.
+
+    :param size: number of declarations
+    """
+    lines = ['#ifndef BENCH_H', '#define BENCH_H', '#include <stddef.h>']
+    for i in range(size):
+        lines.append(f'/* Function {i}, with (parentheses) and [brackets]. */')
+        if i % 3 == 0:
+            lines.append(f'const char *function_{i}(const char *text,\n'
+                         f'    int values[static {i + 1}], size_t length);')
+        elif i % 3 == 1:
+            lines.append(f'struct result_{i} **function_{i}(void);')
+        else:
+            lines.append(f'unsigned int function_{i}(int (*callback)(int),\n'
+                         '    unsigned int count); // trailing comment')
+    lines.append('#endif')
+    return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def scratch() -> Iterator[Path]:
+    """Generate workspaces in a temporary directory with stubs on PATH.
+
+    The environment is restored on exit, so that tests can use workspaces
+    of benchmarks too.
+    """
+    global _scratch_dir
+    saved_env = dict(os.environ)
+    saved_dir = _scratch_dir
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        _scratch_dir = Path(scratch_dir)
+        try:
+            _install_stubs(_scratch_dir / 'bin')
+            yield _scratch_dir
+        finally:
+            _scratch_dir = saved_dir
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+def make_namespace() -> Namespace:
+    """Return arguments selecting own solutions without extra options."""
+    return Namespace(user=None, force=False, jobs=None, timeout=None)
+
+
+def make_workspace(track: common.Track, size: int) -> list[str]:
+    """Generate a workspace with exercises of a track and make it current.
+
+    Workspaces are generated once and shared by benchmarks of a run.
+
+    :param track: track of the exercises
+    :param size: number of exercises
+    :return: slugs of the exercises
+    """
+    assert _scratch_dir, 'benchmarks need a scratch directory'
+    root = _scratch_dir / f'{track}-{size}'
+    config_home = root / '.config'
+    os.environ['EXERCISM_CONFIG_HOME'] = str(config_home)
+    names = [f'exercise-{i}' for i in range(size)]
+    if root.exists():
+        return names
+    config_home.mkdir(parents=True)
+    (config_home / 'user.json').write_text(
+        json.dumps({'workspace': str(root)}))
+    vscode_dir = root / '.vscode'
+    vscode_dir.mkdir()
+    (vscode_dir / 'launch.json.template').write_text(
+        json.dumps(_LAUNCH_TEMPLATE))
+    for name in names:
+        path = root / str(track) / name
+        files = _make_exercise_files(str(track), name)
+        for file, content in files.items():
+            (path / file).parent.mkdir(parents=True, exist_ok=True)
+            (path / file).write_text(content)
+        solution = [x for x in files if 'test' not in x]
+        config = {'blurb': f'Solve {name}.',
+                  'files': {'solution': solution,
+                            'test': [x for x in files if 'test' in x]}}
+        metadata = {'track': str(track), 'exercise': name,
+                    'url': f'https://exercism.org/tracks/{track}/{name}'}
+        (path / '.exercism').mkdir()
+        (path / '.exercism' / 'config.json').write_text(json.dumps(config))
+        (path / '.exercism' / 'metadata.json').write_text(
+            json.dumps(metadata))
+    return names
+
+
+def _make_exercise_files(track: str, name: str) -> dict[str, str]:
+    module = name.replace('-', '_')
+    if track == 'c':
+        return {f'{module}.h': make_c_header(20),
+                f'{module}.c': f'#include "{module}.h"\n',
+                f'test_{module}.c': '\n'.join(
+                    f'void test_{i}(void) {{\n  TEST_IGNORE();\n}}\n'
+                    for i in range(20))}
+    if track == 'python':
+        return {f'{module}.py': 'def solve():\n    pass\n',
+                f'{module}_test.py': f'from {module} import solve\n'}
+    if track == 'rust':
+        return {'Cargo.toml': (f'[package]\nname = "{module}"\n'
+                               'version = "0.1.0"\n'),
+                'src/lib.rs': 'pub fn solve() {}\n',
+                f'tests/{name}.rs': f'use {module}::*;\n'}
+    raise ValueError(f'no exercise files for {track}')
+
+
+def measure(operation: Callable[[], object], repeat: int) -> float:
+    """Return the best time of running the operation a number of times.
+
+    :param operation: operation to measure
+    :param repeat: number of runs
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run benchmarks and print their timings for growing sizes."""
+    parser = ArgumentParser(description='Benchmark the script.')
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, all by default')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='problem sizes instead of the defaults')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs per size, best one is reported')
+    parser.add_argument('--output', type=Path,
+                        help='write results to this json file')
+    parser.add_argument('--compare', type=Path,
+                        help='show change against results of a json file')
+    namespace = parser.parse_args(sys.argv[1:])
+    unknown = set(namespace.names) - set(_BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}, '
+                     f'choose from {", ".join(_BENCHMARKS)}')
+    baseline: dict[str, dict[str, float]] = {}
+    if namespace.compare:
+        with namespace.compare.open() as f:
+            baseline = json.load(f)['results']
+    results: dict[str, dict[str, float]] = {}
+    with scratch():
+        for name in namespace.names or _BENCHMARKS:
+            print(f'{name}:')
+            function, sizes = _BENCHMARKS[name]
+            results[name] = {}
+            for size in namespace.sizes or sizes:
+                seconds = measure(function(size), namespace.repeat)
+                results[name][str(size)] = seconds
+                line = (f'  {size:>8}  {seconds * 1e3:10.3f} ms'
+                        f'  {seconds / size * 1e6:8.3f} us/item')
+                previous = baseline.get(name, {}).get(str(size))
+                if previous:
+                    line += f'  {(seconds / previous - 1) * 100:+7.1f}%'
+                print(line, flush=True)
+    if namespace.output:
+        with namespace.output.open('w') as f:
+            json.dump({'environment': _get_environment(),
+                       'repeat': namespace.repeat,
+                       'results': results}, f, indent=2)
+            f.write('\n')
+
+
+def _install_stubs(bin_dir: Path) -> None:
+    bin_dir.mkdir()
+    stub = bin_dir / 'exercism'
+    stub.write_text(_STUB_EXERCISM)
+    stub.chmod(0o755)
+    os.environ['PATH'] = f'{bin_dir}{os.pathsep}{os.environ["PATH"]}'
+    os.environ['EXERCISM_MANAGER_NO_CACHE'] = '1'
+
+
+def _get_environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], text=True,
+                                cwd=Path(__file__).parent,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created_at': time.time()}
+
+
+if __name__ == '__main__':
+    main()
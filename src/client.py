@@ -0,0 +1,116 @@
+"""Thin client forwarding script invocations to a running server."""
+
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+from pathlib import Path
+from typing import Optional
+
+# Long running commands stay in their own process, which keeps caches warm
+# and stops with the terminal that started it.
+_LOCAL_COMMANDS = ['watch']
+
+
+def get_socket_path() -> Path:
+    """Return the Unix socket the server listens on.
+
+    The socket is kept in a directory of the current user, which the server
+    creates accessible only to them.
+    """
+    runtime_dir = (os.environ.get('XDG_RUNTIME_DIR') or
+                   os.environ.get('TMPDIR') or '/tmp')
+    return (Path(runtime_dir) / f'exercism-manager-{os.getuid()}' /
+            'server.sock')
+
+
+def is_private(directory: Path) -> bool:
+    """Return whether only the current user can access the directory.
+
+    :param directory: directory to check, which should not be a symlink
+    """
+    try:
+        status = os.lstat(directory)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(status.st_mode) and
+            status.st_uid == os.getuid() and
+            not status.st_mode & 0o077)
+
+
+def get_peer_uid(connection: socket.socket) -> Optional[int]:
+    """Return user id of the process on the other end of a Unix socket.
+
+    :param connection: connected Unix socket
+    :return: user id, or None if the platform does not tell
+    """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_PEERCRED,
+                                        struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return int(uid)
+
+
+def forward(argv: list[str]) -> Optional[int]:
+    """Run script with given arguments on the server.
+
+    Standard streams and environment of this process are passed to the
+    server, so they are only sent to a server of the same user. Output of
+    the command is written directly to the streams. The server cancels the
+    command if this process stops before it finishes. Commands of other
+    clients run first, as the server runs one command at a time.
+
+    :param argv: command line arguments
+    :return: exit code, or None if no server is running
+    """
+    path = get_socket_path()
+    if not is_private(path.parent):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+    except OSError:
+        client.close()
+        return None
+    with client:
+        if get_peer_uid(client) != os.getuid():
+            print(f'ignoring server on {path} of another user',
+                  file=sys.stderr)
+            return None
+        request = json.dumps({'argv': argv,
+                              'cwd': os.getcwd(),
+                              'env': dict(os.environ)})
+        socket.send_fds(client, [request.encode() + b'\n'], [0, 1, 2])
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = client.recv(4096)
+            if not chunk:
+                print('server closed connection', file=sys.stderr)
+                return 1
+            response += chunk
+    code: int = json.loads(response)['exit']
+    return code
+
+
+def main() -> None:
+    """Run script with given arguments, on the server if there is one."""
+    code = None
+    try:
+        if not any(x in _LOCAL_COMMANDS for x in sys.argv[1:]):
+            code = forward(sys.argv[1:])
+    except KeyboardInterrupt:
+        # Closing the connection cancels the command on the server.
+        sys.exit(130)
+    if code is None:
+        import manage
+        manage.main()
+    else:
+        sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
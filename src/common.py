@@ -3,12 +3,35 @@
 from __future__ import annotations
 
 import abc
+import collections
+import contextlib
+import functools
+import hashlib
+import os
+import shutil
+import signal
 import subprocess
-from argparse import ArgumentError, ArgumentParser
+import sys
+import threading
+import time
+from argparse import ArgumentError, ArgumentParser, Namespace
 from pathlib import Path
+from typing import (Any, Callable, ContextManager, Deque, Iterator, Mapping,
+                    Optional, Sequence, Union)
 
+import index
+import timing
 from exercise import Exercise
 
+_output = threading.local()
+_print_lock = threading.Lock()
+
+# Lines of output kept for each streamed process.
+_OUTPUT_LINES = 1000
+
+# Submissions uploading at once when submitting many exercises.
+_SUBMIT_JOBS = 4
+
 
 def get_default_commands() -> list[Command]:
     """Return list of commands common to all tracks."""
@@ -19,6 +42,533 @@ def get_default_commands() -> list[Command]:
             SubmitCommand()]
 
 
+@contextlib.contextmanager
+def prefix_output(prefix: str) -> Iterator[None]:
+    """Prefix output of commands run on the current thread.
+
+    Output of subprocesses and text printed with echo are streamed line by
+    line with the prefix, so that lines of concurrent commands do not mix.
+
+    :param prefix: text to put before each line
+    """
+    previous = getattr(_output, 'prefix', None)
+    _output.prefix = prefix
+    try:
+        yield
+    finally:
+        _output.prefix = previous
+
+
+def echo(text: str) -> None:
+    """Print text, prefixing each line if output is being prefixed.
+
+    :param text: text to print
+    """
+    prefix: Optional[str] = getattr(_output, 'prefix', None)
+    if prefix is None:
+        print(text, flush=True)
+        return
+    lines = ''.join(f'{prefix}{x}\n' for x in text.splitlines() or [''])
+    with _print_lock:
+        sys.stdout.write(lines)
+        sys.stdout.flush()
+
+
+class TestCounts:
+    """Number of tests of an exercise by outcome."""
+
+    def __init__(self, passed: int = 0, failed: int = 0, ignored: int = 0,
+                 duration: Optional[float] = None):
+        """Create counts.
+
+        :param passed: number of passed tests
+        :param failed: number of failed tests
+        :param ignored: number of ignored or skipped tests
+        :param duration: seconds the tests ran, if the tool reports it
+        """
+        self.passed = passed
+        self.failed = failed
+        self.ignored = ignored
+        self.duration = duration
+
+    @property
+    def total(self) -> int:
+        """Number of all tests."""
+        return self.passed + self.failed + self.ignored
+
+    def add(self, other: TestCounts) -> None:
+        """Add counts of other tests of the same exercise.
+
+        :param other: counts to add
+        """
+        self.passed += other.passed
+        self.failed += other.failed
+        self.ignored += other.ignored
+        if other.duration is not None:
+            self.duration = (self.duration or 0) + other.duration
+
+
+class MemoryErrors:
+    """Memory errors and leaks of an exercise found by a checker."""
+
+    def __init__(self, errors: Optional[dict[str, int]] = None,
+                 leaked_bytes: int = 0, leaked_blocks: int = 0):
+        """Create summary.
+
+        :param errors: number of errors by kind, such as heap-buffer-overflow
+        :param leaked_bytes: number of bytes never freed
+        :param leaked_blocks: number of allocations never freed
+        """
+        self.errors = errors or {}
+        self.leaked_bytes = leaked_bytes
+        self.leaked_blocks = leaked_blocks
+
+    @property
+    def total(self) -> int:
+        """Number of all errors, leaks excluded."""
+        return sum(self.errors.values())
+
+    def add(self, other: MemoryErrors) -> None:
+        """Add findings of another check of the same exercise.
+
+        :param other: findings to add
+        """
+        for kind, count in other.errors.items():
+            self.errors[kind] = self.errors.get(kind, 0) + count
+        self.leaked_bytes += other.leaked_bytes
+        self.leaked_blocks += other.leaked_blocks
+
+    def __str__(self) -> str:
+        """Short description of findings.
+
+        >>> str(MemoryErrors({'heap-use-after-free': 1}, 24, 2))
+        '1 memory error, 24 bytes leaked in 2 blocks'
+        >>> str(MemoryErrors())
+        'no memory errors'
+        """
+        parts = []
+        if self.total:
+            parts.append(f'{self.total} memory error'
+                         f'{"s" if self.total > 1 else ""}')
+        if self.leaked_blocks:
+            parts.append(f'{self.leaked_bytes} bytes leaked in '
+                         f'{self.leaked_blocks} blocks')
+        return ', '.join(parts) or 'no memory errors'
+
+
+@contextlib.contextmanager
+def collect_tests() -> Iterator[dict[int, TestCounts]]:
+    """Collect test counts recorded by commands run on the current thread.
+
+    Yields counts by id of the exercise, filled as commands record them.
+    """
+    with _collect('tests') as tests:
+        yield tests
+
+
+def record_tests(exercise: Exercise, counts: TestCounts) -> None:
+    """Record test counts of an exercise if they are being collected.
+
+    :param exercise: exercise the tests belong to
+    :param counts: counts parsed from the output of the test tool
+    """
+    tests: Optional[dict[int, TestCounts]] = getattr(_output, 'tests', None)
+    if tests is not None:
+        tests.setdefault(id(exercise), TestCounts()).add(counts)
+
+
+@contextlib.contextmanager
+def collect_memory() -> Iterator[dict[int, MemoryErrors]]:
+    """Collect memory errors recorded by commands run on the current thread.
+
+    Yields findings by id of the exercise, filled as commands record them.
+    """
+    with _collect('memory') as memory:
+        yield memory
+
+
+def record_memory(exercise: Exercise, errors: MemoryErrors) -> None:
+    """Record memory errors of an exercise if they are being collected.
+
+    :param exercise: exercise the findings belong to
+    :param errors: findings parsed from the output of the checker
+    """
+    memory: Optional[dict[int, MemoryErrors]] = getattr(_output, 'memory',
+                                                        None)
+    if memory is not None:
+        memory.setdefault(id(exercise), MemoryErrors()).add(errors)
+
+
+@contextlib.contextmanager
+def collect_exit_statuses() -> Iterator[dict[int, int]]:
+    """Collect exit statuses recorded by commands run on the current thread.
+
+    Yields exit status by id of the exercise, filled as commands record
+    them.
+    """
+    with _collect('exit_statuses') as exit_statuses:
+        yield exit_statuses
+
+
+def record_exit_status(exercise: Exercise, exit_status: int) -> None:
+    """Record exit status of a process run for many exercises at once.
+
+    :param exercise: exercise the process ran for
+    :param exit_status: exit status of the process
+    """
+    exit_statuses: Optional[dict[int, int]] = getattr(
+        _output, 'exit_statuses', None)
+    if exit_statuses is not None:
+        exit_statuses[id(exercise)] = exit_status
+
+
+@contextlib.contextmanager
+def _collect(name: str) -> Iterator[dict[int, Any]]:
+    records: dict[int, Any] = {}
+    previous = getattr(_output, name, None)
+    setattr(_output, name, records)
+    try:
+        yield records
+    finally:
+        setattr(_output, name, previous)
+
+
+class Cancelled(Exception):
+    """Raised when a command is stopped by cancelling its scope."""
+
+
+class Failed(Exception):
+    """Raised when a command fails for an exercise, with the reason."""
+
+
+def get_cancel_scope() -> Optional[CancelScope]:
+    """Return the scope of processes started on the current thread.
+
+    Threads started by a command enter the same scope, so that cancelling
+    the command also stops their processes.
+    """
+    return getattr(_output, 'scope', None)
+
+
+class CancelScope:
+    """Processes started on a thread that can be terminated as a whole.
+
+    Processes started within the scope run in their own process group, so
+    that cancelling also terminates their children, such as compilers run
+    by make or cargo.
+    """
+
+    def __init__(self) -> None:
+        """Create scope that is not cancelled."""
+        self._lock = threading.Lock()
+        self._processes: set[subprocess.Popen[str]] = set()
+        self._cancelled = False
+
+    def __enter__(self) -> CancelScope:
+        """Start processes of the current thread within this scope."""
+        _output.scope = self
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Stop starting processes within this scope."""
+        _output.scope = None
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the scope was cancelled."""
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Terminate running processes and prevent new ones from starting."""
+        with self._lock:
+            self._cancelled = True
+            for process in self._processes:
+                _kill_group(process, signal.SIGTERM)
+
+    @contextlib.contextmanager
+    def popen(self, args: Sequence[Union[str, Path]],
+              **kwargs: Any) -> Iterator[subprocess.Popen[str]]:
+        """Start a process in this scope, raising Cancelled if cancelled.
+
+        :param args: program and its arguments
+        :param kwargs: other arguments for Popen
+        """
+        with self._lock:
+            if self._cancelled:
+                raise Cancelled()
+            process = subprocess.Popen(args, process_group=0, **kwargs)
+            self._processes.add(process)
+        try:
+            with process:
+                yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self._cancelled:
+            raise Cancelled()
+
+
+class ProcessResult:
+    """Outcome of a finished subprocess."""
+
+    def __init__(self, args: Sequence[Union[str, Path]], returncode: int,
+                 duration: float, output: list[str], timed_out: bool):
+        """Create result.
+
+        :param args: program and its arguments
+        :param returncode: exit status, negative if killed by a signal
+        :param duration: wall time of the process in seconds
+        :param output: last lines of output, if output was streamed
+        :param timed_out: whether the process was killed for its timeout
+        """
+        self.args = args
+        self.returncode = returncode
+        self.duration = duration
+        self.output = output
+        self.timed_out = timed_out
+
+    @property
+    def error(self) -> Optional[str]:
+        """Reason of failure as for the raised error, or None if it passed."""
+        try:
+            self.check()
+        except subprocess.SubprocessError as e:
+            return describe_error(e)
+        return None
+
+    def check(self) -> None:
+        """Raise TimeoutExpired or CalledProcessError if the process failed.
+
+        Output of the process is attached to the exception if streamed.
+        """
+        output = '\n'.join(self.output)
+        if self.timed_out:
+            raise subprocess.TimeoutExpired(self.args, self.duration, output)
+        if self.returncode:
+            raise subprocess.CalledProcessError(self.returncode, self.args,
+                                                output)
+
+
+def run_process(args: Sequence[Union[str, Path]],
+                cwd: Optional[Path] = None,
+                env: Optional[Mapping[str, str]] = None,
+                timeout: Optional[float] = None,
+                on_line: Optional[Callable[[str], None]] = None
+                ) -> ProcessResult:
+    """Run a subprocess and return its result without raising on failure.
+
+    Output goes directly to the terminal, unless output is prefixed or
+    lines are handled by the caller. Then standard error is merged into
+    standard output and lines are streamed as they come, keeping only the
+    last ones in the result.
+
+    :param args: program and its arguments
+    :param cwd: working directory for the process
+    :param env: environment variables to add for the process
+    :param timeout: seconds after which the process and its children are
+                    killed
+    :param on_line: handler of output lines instead of printing them
+    """
+    stream = on_line is not None or getattr(_output, 'prefix', None)
+    output: Deque[str] = collections.deque(maxlen=_OUTPUT_LINES)
+    kwargs: dict[str, Any] = {}
+    if stream:
+        kwargs.update(bufsize=1, stdout=subprocess.PIPE,
+                      stderr=subprocess.STDOUT)
+    timed_out = threading.Event()
+    start = time.monotonic()
+    with timing.span(Path(args[0]).name, 'subprocess'), \
+            _popen(args, cwd, env, timeout is not None,
+                   **kwargs) as process:
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, _kill_on_timeout,
+                                    (process, timed_out))
+            timer.daemon = True
+            timer.start()
+        try:
+            if process.stdout:
+                for line in process.stdout:
+                    line = line.rstrip('\n')
+                    output.append(line)
+                    (on_line or echo)(line)
+            process.wait()
+        except BaseException:
+            _kill_group(process, signal.SIGKILL)
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+    return ProcessResult(args=args,
+                         returncode=process.returncode,
+                         duration=time.monotonic() - start,
+                         output=list(output),
+                         timed_out=timed_out.is_set())
+
+
+def check_call(args: Sequence[Union[str, Path]],
+               cwd: Optional[Path] = None,
+               env: Optional[Mapping[str, str]] = None,
+               timeout: Optional[float] = None) -> None:
+    """Run a subprocess, raising CalledProcessError if it fails.
+
+    TimeoutExpired is raised instead if it runs longer than the timeout.
+
+    :param args: program and its arguments
+    :param cwd: working directory for the process
+    :param env: environment variables to add for the process
+    :param timeout: seconds after which the process is killed
+    """
+    run_process(args, cwd=cwd, env=env, timeout=timeout).check()
+
+
+# Errors that fail the command for an exercise rather than the script.
+EXERCISE_ERRORS = (ArgumentError, subprocess.CalledProcessError,
+                   subprocess.TimeoutExpired, Cancelled, Failed,
+                   AssertionError, OSError, ValueError)
+
+
+def describe_error(error: Exception) -> str:
+    """Return the reason of failure for an error raised by a command.
+
+    >>> describe_error(subprocess.TimeoutExpired(['pytest'], 2.5))
+    'timed out after 2s'
+    >>> describe_error(subprocess.CalledProcessError(2, ['make']))
+    'exit status 2'
+    >>> describe_error(Cancelled())
+    'cancelled'
+    >>> describe_error(Failed('2 tests failed'))
+    '2 tests failed'
+
+    :param error: one of the exercise errors
+    """
+    if isinstance(error, ArgumentError):
+        return error.message
+    if isinstance(error, subprocess.CalledProcessError):
+        return f'exit status {error.returncode}'
+    if isinstance(error, subprocess.TimeoutExpired):
+        return f'timed out after {error.timeout:.0f}s'
+    if isinstance(error, Cancelled):
+        return 'cancelled'
+    return str(error) or type(error).__name__
+
+
+def _popen(args: Sequence[Union[str, Path]], cwd: Optional[Path],
+           env: Optional[Mapping[str, str]], own_group: bool,
+           **kwargs: Any) -> ContextManager[subprocess.Popen[str]]:
+    full_env = {**os.environ, **env} if env else None
+    scope = get_cancel_scope()
+    if scope is not None:
+        return scope.popen(args, cwd=cwd, env=full_env, text=True,
+                           errors='replace', **kwargs)
+    if own_group:
+        # Killing the group also kills children, such as test binaries.
+        kwargs['process_group'] = 0
+    return subprocess.Popen(args, cwd=cwd, env=full_env, text=True,
+                            errors='replace', **kwargs)
+
+
+def _kill_on_timeout(process: subprocess.Popen[str],
+                     timed_out: threading.Event) -> None:
+    timed_out.set()
+    _kill_group(process, signal.SIGKILL)
+
+
+def _kill_group(process: subprocess.Popen[str], signum: int) -> None:
+    """Send signal to the process, and its group if it leads one."""
+    if process.returncode is not None:
+        return
+    with contextlib.suppress(OSError):
+        if os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, signum)
+        else:
+            process.send_signal(signum)
+
+
+def write_file(path: Path, content: str) -> bool:
+    """Write content to a file unless it already has that content.
+
+    Unchanged files are not touched, so that build tools relying on
+    modification times do not see them as dirty. Changed files are written
+    to a temporary file next to them and renamed over, so that they are
+    never left partially written.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     path = Path(tmp) / 'hello.c'
+    ...     written = write_file(path, 'int x;')
+    ...     os.utime(path, ns=(0, 0))
+    ...     unchanged = write_file(path, 'int x;')
+    ...     written, unchanged, path.stat().st_mtime_ns
+    (True, False, 0)
+
+    :param path: file to write
+    :param content: new content of the file
+    :return: whether the file was written
+    """
+    try:
+        with path.open('r') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    temp = path.with_name(f'.{path.name}.{os.getpid()}.'
+                          f'{threading.get_ident()}.tmp')
+    try:
+        with temp.open('w') as f:
+            f.write(content)
+        if path.exists():
+            shutil.copymode(path, temp)
+        os.replace(temp, path)
+    finally:
+        temp.unlink(missing_ok=True)
+    return True
+
+
+def digest_files(files: list[Path], *extra: str) -> str:
+    """Return a digest of names and contents of files.
+
+    :param files: files to digest, missing files are digested as such
+    :param extra: additional strings that affect the digest
+    """
+    digest = hashlib.sha256()
+    for value in extra:
+        digest.update(value.encode() + b'\0')
+    for file in files:
+        digest.update(str(file).encode() + b'\0')
+        try:
+            digest.update(hashlib.sha256(file.read_bytes()).digest())
+        except OSError:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+def get_tool_version(*args: str) -> str:
+    """Return first line of a tool version output, or empty if unavailable.
+
+    The output is cached until the executable of the tool changes.
+
+    :param args: command printing the version, such as ('make', '--version')
+    """
+    executable = shutil.which(args[0])
+    try:
+        mtime = os.stat(executable).st_mtime_ns if executable else None
+    except OSError:
+        mtime = None
+    return _get_tool_version(args, mtime)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_tool_version(args: tuple[str, ...], mtime: Optional[int]) -> str:
+    try:
+        with timing.span(Path(args[0]).name, 'subprocess'):
+            output = subprocess.run(args, text=True, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL).stdout
+    except OSError:
+        return ''
+    return next(iter(output.splitlines()), '')
+
+
 class Track(metaclass=abc.ABCMeta):
     """All solutions for an Exercism track."""
 
@@ -61,10 +611,58 @@ class Command(metaclass=abc.ABCMeta):
         """Return whether the exercise is needed locally."""
         return True
 
+    def default_jobs(self) -> int:
+        """Return how many exercises run concurrently unless specified."""
+        return 1
+
+    def max_jobs(self) -> Optional[int]:
+        """Return how many exercises may run this command concurrently.
+
+        :return: job limit, or None if exercises are independent
+        """
+        return None
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return files that determine the outcome of the command.
+
+        :return: input files, or None if results cannot be reused
+        """
+        return None
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return tool versions and options that affect the outcome."""
+        return ''
+
+    def records_failures(self) -> bool:
+        """Return whether a failed run replaces the last recorded result."""
+        return True
+
+    def can_run_many(self) -> bool:
+        """Return whether many exercises can be run with a single call."""
+        return False
+
     @abc.abstractmethod
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
 
+    def run_many(self, exercises: list[Exercise]) -> list[Optional[str]]:
+        """Run the command for many exercises at once.
+
+        Commands that can run many exercises override this with a single
+        call. By default the command runs for each exercise in turn.
+
+        :param exercises: downloaded exercises to run the command for
+        :return: error for each exercise, or None if it passed
+        """
+        errors: list[Optional[str]] = []
+        for exercise in exercises:
+            try:
+                self.run(exercise)
+                errors.append(None)
+            except EXERCISE_ERRORS as e:
+                errors.append(describe_error(e))
+        return errors
+
     def __str__(self) -> str:
         """Name of command."""
         return self.name
@@ -87,7 +685,8 @@ class OpenCommand(Command):
         if exercise.user and not exercise.is_downloaded():
             raise ArgumentError(
                 None, 'download a user solution before visiting')
-        subprocess.check_call(['python', '-m', 'webbrowser', exercise.url])
+        check_call(['python', '-m', 'webbrowser', exercise.url],
+                   timeout=exercise.namespace.timeout)
 
 
 class DownloadCommand(Command):
@@ -102,12 +701,23 @@ class DownloadCommand(Command):
         """Return whether the exercise is needed locally."""
         return False
 
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add download specific arguments to the parser."""
+        parser.add_argument('--many', default=False, action='store_true',
+                            help='fetch all exercises concurrently first, '
+                                 'then prepare them in parallel')
+
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
+        self.fetch(exercise)
+        exercise.post_download()
+
+    def fetch(self, exercise: Exercise) -> None:
+        """Download exercise files without preparing them."""
         if exercise.user:
             raise ArgumentError(
                 None, 'download user solutions through exercism CLI instead')
-        exercise.download()
+        exercise.fetch()
 
 
 class InfoCommand(Command):
@@ -133,7 +743,7 @@ class InfoCommand(Command):
                  f'url:            {exercise.url}',
                  f'solution files: {solution_files}',
                  f'test files:     {test_files}']
-        print('\n'.join(filter(None, lines)))
+        echo('\n'.join(filter(None, lines)))
 
 
 class CodeCommand(Command):
@@ -147,7 +757,8 @@ class CodeCommand(Command):
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
         files = exercise.solution_files + exercise.test_files
-        subprocess.check_call(['code'] + [str(x) for x in files])
+        check_call(['code'] + [str(x) for x in files],
+                   timeout=exercise.namespace.timeout)
 
 
 class SubmitCommand(Command):
@@ -158,10 +769,51 @@ class SubmitCommand(Command):
         """Name of the command."""
         return 'submit'
 
+    def default_jobs(self) -> int:
+        """Return a few jobs, as submissions wait on the network."""
+        return _SUBMIT_JOBS
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return solution files, so that unchanged ones are not uploaded.
+
+        The digest of the files is recorded when a submission succeeds.
+        """
+        return exercise.solution_files
+
+    def records_failures(self) -> bool:
+        """Return False, so that the last uploaded files are kept."""
+        return False
+
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
         if exercise.user:
             raise ArgumentError(
                 None, 'submitting user solutions is not allowed')
         files = exercise.solution_files
-        subprocess.check_call(['exercism', 'submit'] + [str(x) for x in files])
+        check_call(['exercism', 'submit'] + [str(x) for x in files],
+                   timeout=exercise.namespace.timeout)
+        index.get_index().add_submission(exercise)
+
+
+class WorkspaceCommand(metaclass=abc.ABCMeta):
+    """Script command operating on the whole workspace."""
+
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        """Name of the command."""
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command specific arguments to the parser."""
+        pass
+
+    @abc.abstractmethod
+    def run(self, namespace: Namespace) -> None:
+        """Run the command.
+
+        :param namespace: parsed arguments, track and exercise are filters
+        """
+
+    def __str__(self) -> str:
+        """Name of command."""
+        return self.name
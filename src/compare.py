@@ -0,0 +1,247 @@
+"""Group similar solutions of other users to an exercise."""
+
+from __future__ import annotations
+
+import difflib
+import re
+import zlib
+from argparse import ArgumentParser, BooleanOptionalAction, Namespace
+from pathlib import Path
+from typing import Optional
+
+import common
+import workspace
+from exercise import Exercise
+
+Signature = list[int]
+
+# Signatures are split into bands of rows. Solutions sharing all rows of any
+# band are compared, which finds pairs with a similarity of about 0.5 and
+# above without comparing all pairs.
+_BANDS = 16
+_ROWS = 4
+_BINS = _BANDS * _ROWS
+
+# Number of consecutive tokens hashed together.
+_SHINGLE_SIZE = 4
+
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class CompareCommand(common.Command):
+    """Cluster solutions of other users and diff them against this one."""
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'compare'
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add similarity threshold and diff options."""
+        parser.add_argument('--threshold', type=float, default=0.8,
+                            help='estimated similarity of solutions in the '
+                                 'same cluster, between 0 and 1')
+        parser.add_argument('--diff', action=BooleanOptionalAction,
+                            default=True,
+                            help='show diff of a solution of each cluster '
+                                 'against this solution')
+
+    def needs_download(self) -> bool:
+        """Return whether the exercise is needed locally."""
+        return False
+
+    def run(self, exercise: Exercise) -> None:
+        """Run the command.
+
+        Solutions of all users under the users directory of the workspace
+        are clustered, and the solution with the most similar neighbors
+        represents each cluster.
+        """
+        solutions = [x for x in self.__get_solutions(exercise)
+                     if x.solution_files]
+        signatures = [get_signature(_read(x.solution_files))
+                      for x in solutions]
+        clusters = find_clusters(signatures, exercise.namespace.threshold)
+        if not clusters:
+            common.echo(f'no solutions of other users for {exercise}, '
+                        'download them with --user')
+            return
+        own = (get_signature(_read(exercise.solution_files))
+               if exercise.is_downloaded() else None)
+        lines = []
+        for i, (representative, members) in enumerate(clusters, 1):
+            solution = solutions[representative]
+            line = (f'cluster {i}: {len(members)} solution'
+                    f'{"s" if len(members) > 1 else ""}')
+            if own:
+                similarity = get_similarity(own, signatures[representative])
+                line += f', {similarity:.2f} similar to mine'
+            lines.append(line)
+            lines.append('  ' + ', '.join(
+                str(solutions[x].user) for x in members))
+            if own and exercise.namespace.diff:
+                lines.extend(_diff(exercise, solution))
+        common.echo('\n'.join(lines))
+
+    def __get_solutions(self, exercise: Exercise) -> list[Exercise]:
+        users_dir = workspace.get_root() / 'users'
+        if not users_dir.is_dir():
+            return []
+        solutions = []
+        for user in sorted(x.name for x in users_dir.iterdir()):
+            if user == exercise.user:
+                continue
+            namespace = Namespace(**vars(exercise.namespace))
+            namespace.user = user
+            solution = Exercise(exercise.track, namespace, exercise.name)
+            if solution.path.is_dir():
+                solutions.append(solution)
+        return solutions
+
+
+def get_signature(source: str) -> Optional[Signature]:
+    """Return MinHash signature of the token shingles of the source.
+
+    A single hash of each shingle is split into a bin and a value, and the
+    minimum value of each bin is kept. Empty bins borrow from the next
+    bin, so that signatures of short sources can still be compared.
+
+    >>> get_signature('') is None
+    True
+    >>> len(get_signature('int main(void) { return 0; }'))
+    64
+
+    :param source: content of the solution files
+    :return: signature, or None if the source has too few tokens
+    """
+    tokens = _TOKEN_RE.findall(source)
+    if len(tokens) < _SHINGLE_SIZE:
+        return None
+    bins: list[Optional[int]] = [None] * _BINS
+    for i in range(len(tokens) - _SHINGLE_SIZE + 1):
+        shingle = ' '.join(tokens[i:i + _SHINGLE_SIZE]).encode()
+        value = zlib.crc32(shingle)
+        index, value = value % _BINS, value // _BINS
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+    signature = []
+    for i in range(_BINS):
+        offset = 0
+        while bins[(i + offset) % _BINS] is None:
+            offset += 1
+        signature.append(bins[(i + offset) % _BINS] or 0)
+    return signature
+
+
+def get_similarity(a: Optional[Signature], b: Optional[Signature]) -> float:
+    r"""Return estimated Jaccard similarity of two signatures.
+
+    >>> a = get_signature('def add(a, b):\n    return a + b\n')
+    >>> get_similarity(a, a)
+    1.0
+    >>> get_similarity(a, None)
+    0.0
+
+    :param a: signature of a solution
+    :param b: signature of another solution
+    """
+    if a is None or b is None:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / _BINS
+
+
+def find_clusters(signatures: list[Optional[Signature]], threshold: float
+                  ) -> list[tuple[int, list[int]]]:
+    r"""Group signatures whose estimated similarity reaches the threshold.
+
+    Only solutions sharing a band of their signatures are compared. Within
+    each band, a solution is compared with one member of every cluster met
+    so far, so groups of near duplicates cost a comparison per solution
+    instead of one per pair. Similar pairs are joined transitively into
+    clusters.
+
+    >>> a = get_signature('for (int i = 0; i < n; i++) sum += i;')
+    >>> b = get_signature('while (n--) { total = total * 2; }')
+    >>> find_clusters([a, b, a], 0.8)
+    [(0, [0, 2]), (1, [1])]
+
+    Comparisons grow linearly with the number of near duplicates:
+
+    >>> from unittest import mock
+    >>> import compare
+    >>> code = 'def f{0}(x):\n    y = x * {0}\n    return y + {0}\n'
+    >>> signatures = [get_signature(code.format(i % 3)) for i in range(2000)]
+    >>> with mock.patch.object(compare, 'get_similarity',
+    ...                        wraps=get_similarity) as similarity:
+    ...     clusters = find_clusters(signatures, 0.8)
+    >>> len(clusters), similarity.call_count <= 3 * len(signatures)
+    (3, True)
+
+    :param signatures: signature of each solution
+    :param threshold: minimum similarity of pairs in a cluster
+    :return: index of the representative and indices of members of each
+        cluster, largest clusters first
+    """
+    parents = list(range(len(signatures)))
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    neighbors = [0] * len(signatures)
+    compared: set[tuple[int, int]] = set()
+    for band in range(_BANDS):
+        buckets: dict[tuple[int, ...], list[int]] = {}
+        rows = slice(band * _ROWS, (band + 1) * _ROWS)
+        for i, signature in enumerate(signatures):
+            if signature is not None:
+                buckets.setdefault(tuple(signature[rows]), []).append(i)
+        for bucket in buckets.values():
+            # One member of each cluster met in this bucket.
+            heads: dict[int, int] = {}
+            for b in bucket:
+                for a in list(heads.values()):
+                    if (a, b) in compared or find(a) == find(b):
+                        continue
+                    compared.add((a, b))
+                    if get_similarity(signatures[a],
+                                      signatures[b]) >= threshold:
+                        neighbors[a] += 1
+                        neighbors[b] += 1
+                        parents[find(a)] = find(b)
+                heads = {find(x): x for x in reversed([*heads.values(), b])}
+    groups: dict[int, list[int]] = {}
+    for i in range(len(signatures)):
+        groups.setdefault(find(i), []).append(i)
+    clusters = [(max(x, key=lambda i: (neighbors[i], -i)), x)
+                for x in groups.values()]
+    return sorted(clusters, key=lambda x: (-len(x[1]), x[1][0]))
+
+
+def _read(files: list[Path]) -> str:
+    contents = []
+    for file in files:
+        try:
+            contents.append(file.read_text())
+        except (OSError, UnicodeDecodeError):
+            pass
+    return '\n'.join(contents)
+
+
+def _diff(exercise: Exercise, other: Exercise) -> list[str]:
+    lines: list[str] = []
+    for file in exercise.solution_files:
+        relative = file.relative_to(exercise.path)
+        other_file = other.path / relative
+        try:
+            mine = file.read_text().splitlines()
+            theirs = other_file.read_text().splitlines()
+        except (OSError, UnicodeDecodeError):
+            continue
+        lines.extend('    ' + x.rstrip('\n') for x in difflib.unified_diff(
+            mine, theirs, f'mine/{relative}', f'{other.user}/{relative}',
+            lineterm=''))
+    return lines
@@ -3,28 +3,116 @@
 from __future__ import annotations
 
 import json
-import subprocess
 from argparse import Namespace
-from functools import reduce
+from functools import cached_property, reduce
 from pathlib import Path
 from typing import Any, Mapping, Optional
 
 import common
+import index
+import timing
+import workspace
+
+
+class ConfigFile:
+    """JSON config file that is parsed again only when it changes on disk.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     path = Path(tmp) / 'config.json'
+    ...     _ = path.write_text('{"blurb": "Say hi."}')
+    ...     config = ConfigFile(path)
+    ...     before = config.get_str(['blurb'])
+    ...     _ = path.write_text('{"blurb": "Say hello."}')
+    ...     before, config.get_str(['blurb'])
+    ('Say hi.', 'Say hello.')
+    """
+
+    def __init__(self, path: Path):
+        """Create config for the given file.
+
+        :param path: path of the json file
+        """
+        self._path = path
+        self._stamp: Optional[tuple[int, int, int]] = None
+        self._config: Any = None
+
+    @property
+    def path(self) -> Path:
+        """Path of the config file."""
+        return self._path
+
+    @property
+    def config(self) -> Any:
+        """Parsed content of the file, or None if it does not exist."""
+        try:
+            stat = self._path.stat()
+        except FileNotFoundError:
+            self.invalidate()
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with timing.span(f'parse {self._path.name}', 'config'):
+                with self._path.open() as f:
+                    self._config = json.load(f)
+            self._stamp = stamp
+        return self._config
+
+    def get(self, keys: list[str]) -> Any:
+        """Return config value for the keys, or None if not found.
+
+        :param keys: list of keys to recursively lookup config
+        """
+        def lookup(c: Any, k: Any) -> Any:
+            return c.get(k, None) if isinstance(c, Mapping) else None
+        return reduce(lookup, keys, self.config)
+
+    def get_str(self, keys: list[str]) -> Optional[str]:
+        """Return string config value for the keys, or None if not found.
+
+        :param keys: list of keys to recursively lookup config
+        """
+        value = self.get(keys)
+        return value if isinstance(value, str) else None
+
+    def get_list(self, keys: list[str]) -> list[str]:
+        """Return list config value for the keys, or empty if not found.
+
+        :param keys: list of keys to recursively lookup config
+        """
+        value = self.get(keys)
+        return [str(x) for x in value] if isinstance(value, list) else []
+
+    def invalidate(self) -> None:
+        """Drop parsed content so that the file is read on next access."""
+        self._stamp = None
+        self._config = None
+
+
+# Config files shared by all exercises of the process, so that they are
+# parsed once even when the same exercise is created again.
+_CONFIG_FILES: dict[Path, ConfigFile] = {}
 
 
 class Exercise:
     """Exercise object."""
 
-    def __init__(self, track: common.Track, namespace: Namespace):
-        """Create new object."""
+    def __init__(self, track: common.Track, namespace: Namespace, name: str):
+        """Create new object.
+
+        :param track: track of the exercise
+        :param namespace: user supplied arguments
+        :param name: slug of the exercise
+        """
         self._track = track
         self._namespace = namespace
+        self._name = name
+        self._configs: dict[str, ConfigFile] = {}
 
     @property
     def name(self) -> str:
         """Return the slug of the exercise."""
-        name: str = self.namespace.exercise
-        return name
+        return self._name
 
     @property
     def track(self) -> common.Track:
@@ -34,8 +122,7 @@ class Exercise:
     @property
     def blurb(self) -> str:
         """Exercism solutions root."""
-        blurb: str = self._get_config('config.json', ['blurb'])
-        return blurb
+        return self.get_config_file('config.json').get_str(['blurb']) or ''
 
     @property
     def user(self) -> Optional[str]:
@@ -46,33 +133,32 @@ class Exercise:
     @property
     def solution_files(self) -> list[Path]:
         """Code files for given solution."""
-        files = self._get_config('config.json', ['files', 'solution'])
+        config = self.get_config_file('config.json')
+        files = config.get_list(['files', 'solution'])
         return ([self.path / x for x in files] +
                 self._track.get_additional_solution_files(self))
 
     @property
     def test_files(self) -> list[Path]:
         """Test files for given solution."""
-        files = self._get_config('config.json', ['files', 'test'])
+        config = self.get_config_file('config.json')
+        files = config.get_list(['files', 'test'])
         return [self.path / x for x in files]
 
-    @property
+    @cached_property
     def path(self) -> Path:
         """Exercise directory."""
-        return (self.root /
-                (Path('users') / self.user if self.user else '') /
-                Path(self._track.name) / self.name)
+        return workspace.get_track_dir(self._track.name, self.user) / self.name
 
     @property
     def root(self) -> Path:
         """Exercism solutions root."""
-        return Path(subprocess.check_output(
-            ['exercism', 'workspace'], text=True).strip())
+        return workspace.get_root()
 
     @property
     def url(self) -> str:
         """Exercism solutions root."""
-        url: str = self._get_config('metadata.json', ['url'])
+        url = self.get_config_file('metadata.json').get_str(['url'])
         if url:
             return url
         assert not self.user
@@ -98,20 +184,26 @@ class Exercise:
         assert len(files) == 1, f'multiple file matching "{pattern}": {files}'
         return files[0]
 
+    def get_config_file(self, config_file: str) -> ConfigFile:
+        """Return the Exercism config file for solution.
+
+        Each file is parsed at most once until it changes on disk.
+
+        :param config_file: json file name for the config
+        """
+        if config_file not in self._configs:
+            path = self.path / '.exercism' / config_file
+            self._configs[config_file] = _CONFIG_FILES.setdefault(
+                path, ConfigFile(path))
+        return self._configs[config_file]
+
     def _get_config(self, config_file: str, keys: list[str]) -> Any:
         """Return Exercism config for solution, or None if not found.
 
         :param config_file: json file name for the config
         :param keys: list of keys to recursively lookup config
         """
-        path = self.path / '.exercism' / config_file
-        if not path.exists():
-            return None
-        with path.open() as f:
-            def lookup(c: Any, k: Any) -> Any:
-                return c.get(k, None) if isinstance(c, Mapping) else None
-            config = json.load(f)
-            return reduce(lookup, keys, config)
+        return self.get_config_file(config_file).get(keys)
 
     def is_downloaded(self) -> bool:
         """Return whether the exercise is downloaded."""
@@ -119,14 +211,39 @@ class Exercise:
 
     def download(self) -> None:
         """Download the exercise."""
+        self.fetch()
+        self.post_download()
+
+    def fetch(self) -> bool:
+        """Download exercise files unless they are already present.
+
+        :return: whether the exercise was downloaded from Exercism
+        """
         assert not self.user
+        with timing.span('fetch', 'download'):
+            return self._fetch()
+
+    def _fetch(self) -> bool:
+        if index.get_index().is_downloaded(self):
+            return False
+        fetched = False
         if not (self.path.exists() and
                 all(x.exists() for x in self.solution_files)):
-            subprocess.check_call(['exercism', 'download',
-                                   f'--exercise={self.name}',
-                                   f'--track={self.track}'])
-        self.post_download()
+            common.check_call(['exercism', 'download',
+                               f'--exercise={self.name}',
+                               f'--track={self.track}'],
+                              timeout=self.namespace.timeout)
+            self._invalidate_configs()
+            fetched = True
+        index.get_index().add_download(self)
+        return fetched
 
     def post_download(self) -> None:
         """Prepare solution after download for faster solve."""
-        self._track.post_download(self)
+        with timing.span('post download', 'download'):
+            self._track.post_download(self)
+        self._invalidate_configs()
+
+    def _invalidate_configs(self) -> None:
+        for config in self._configs.values():
+            config.invalidate()
@@ -0,0 +1,96 @@
+"""Append-only history of test durations."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+import workspace
+
+if TYPE_CHECKING:
+    from exercise import Exercise
+
+_lock = threading.Lock()
+
+
+class Run:
+    """Durations of tests in a single test run of an exercise."""
+
+    def __init__(self, track: str, exercise: str, user: Optional[str],
+                 recorded_at: float, durations: dict[str, float]):
+        """Create run.
+
+        :param track: name of the track
+        :param exercise: slug of the exercise
+        :param user: user of the solution if different from current user
+        :param recorded_at: time of the run
+        :param durations: seconds of each test by name
+        """
+        self.track = track
+        self.exercise = exercise
+        self.user = user
+        self.recorded_at = recorded_at
+        self.durations = durations
+
+    @property
+    def key(self) -> tuple[str, str, Optional[str]]:
+        """Track, exercise and user the run belongs to."""
+        return (self.track, self.exercise, self.user)
+
+    def __str__(self) -> str:
+        """Track, user and slug of the exercise."""
+        return '/'.join(x for x in (self.track, self.user, self.exercise)
+                        if x)
+
+
+def get_history_file() -> Path:
+    """Return the file keeping test durations of the workspace."""
+    return workspace.get_state_dir() / 'test-durations.jsonl'
+
+
+def record(exercise: Exercise, durations: dict[str, float]) -> None:
+    """Append durations of a test run of an exercise to the history.
+
+    Each run is written as a single line, so that runs of concurrent
+    processes are not interleaved.
+
+    :param exercise: exercise the tests belong to
+    :param durations: seconds of each test by name
+    """
+    if not durations:
+        return
+    line = json.dumps({'track': str(exercise.track),
+                       'exercise': exercise.name,
+                       'user': exercise.user,
+                       'recorded_at': time.time(),
+                       'durations': durations}) + '\n'
+    path = get_history_file()
+    with _lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a') as f:
+            f.write(line)
+
+
+def read() -> Iterator[Run]:
+    """Yield recorded runs of the workspace, oldest first.
+
+    Lines that cannot be parsed, such as one cut by a crash, are skipped.
+    """
+    try:
+        f = get_history_file().open()
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                entry: dict[str, Any] = json.loads(line)
+                yield Run(track=entry['track'],
+                          exercise=entry['exercise'],
+                          user=entry['user'],
+                          recorded_at=entry['recorded_at'],
+                          durations=entry['durations'])
+            except (ValueError, KeyError, TypeError):
+                continue
@@ -0,0 +1,355 @@
+"""Local index of exercises in the Exercism workspace."""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+import timing
+import workspace
+
+if TYPE_CHECKING:
+    from exercise import Exercise
+
+
+class Entry:
+    """Exercise as recorded in the index."""
+
+    def __init__(self, track: str, slug: str, user: str, blurb: str,
+                 downloaded_at: Optional[float],
+                 submitted_at: Optional[float], passed: Optional[bool],
+                 tested_at: Optional[float]):
+        """Create entry.
+
+        :param track: name of the track
+        :param slug: slug of the exercise
+        :param user: user of the solution, empty for own solutions
+        :param blurb: short description of the exercise
+        :param downloaded_at: time of download, if known
+        :param submitted_at: time of the last submission through the script
+        :param passed: whether tests passed on their last run, if they ran
+        :param tested_at: time of the last test run
+        """
+        self.track = track
+        self.slug = slug
+        self.user = user
+        self.blurb = blurb
+        self.downloaded_at = downloaded_at
+        self.submitted_at = submitted_at
+        self.passed = passed
+        self.tested_at = tested_at
+
+
+class Index:
+    """SQLite backed record of local exercises."""
+
+    _SCHEMA_VERSION = 3
+    _SCHEMA = ['''
+        CREATE TABLE exercises (
+            track TEXT NOT NULL,
+            slug TEXT NOT NULL,
+            user TEXT NOT NULL,
+            blurb TEXT NOT NULL DEFAULT '',
+            solution_files TEXT NOT NULL DEFAULT '[]',
+            test_files TEXT NOT NULL DEFAULT '[]',
+            config_mtime INTEGER,
+            metadata_mtime INTEGER,
+            download_mtime INTEGER,
+            downloaded_at REAL,
+            submitted_at REAL,
+            PRIMARY KEY (track, slug, user)
+        )''', '''
+        CREATE TABLE results (
+            track TEXT NOT NULL,
+            slug TEXT NOT NULL,
+            user TEXT NOT NULL,
+            command TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            passed INTEGER NOT NULL,
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (track, slug, user, command)
+        )''']
+
+    def __init__(self, path: Path):
+        """Open or create the index.
+
+        :param path: path of the database file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version != Index._SCHEMA_VERSION:
+            # The index is a cache, rebuild it instead of migrating.
+            self._db.execute('DROP TABLE IF EXISTS exercises')
+            self._db.execute('DROP TABLE IF EXISTS results')
+            for statement in Index._SCHEMA:
+                self._db.execute(statement)
+            self._db.execute(
+                f'PRAGMA user_version = {Index._SCHEMA_VERSION}')
+
+    def is_downloaded(self, exercise: Exercise) -> bool:
+        """Return whether the exercise was downloaded and is still intact.
+
+        :param exercise: exercise to lookup
+        """
+        mtime = _get_metadata_mtime(exercise)
+        if mtime is None:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                'SELECT download_mtime FROM exercises '
+                'WHERE track = ? AND slug = ? AND user = ?',
+                _key(exercise)).fetchone()
+        return row is not None and row[0] == mtime
+
+    def add_download(self, exercise: Exercise) -> None:
+        """Record the exercise as downloaded.
+
+        :param exercise: downloaded exercise
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO exercises '
+                '(track, slug, user, download_mtime, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT DO UPDATE SET '
+                'download_mtime = excluded.download_mtime, '
+                'downloaded_at = excluded.downloaded_at',
+                (*_key(exercise), _get_metadata_mtime(exercise), time.time()))
+
+    def add_submission(self, exercise: Exercise) -> None:
+        """Record the exercise as submitted now.
+
+        :param exercise: submitted exercise
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO exercises (track, slug, user, submitted_at) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT DO UPDATE SET '
+                'submitted_at = excluded.submitted_at',
+                (*_key(exercise), time.time()))
+
+    def refresh(self, root: Path) -> None:
+        """Update exercises from the Exercism configs in the workspace.
+
+        Only configs that changed since the last refresh are parsed, and
+        exercises that no longer exist are removed.
+
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     root = Path(tmp)
+        ...     config_dir = root / 'c' / 'bob' / '.exercism'
+        ...     config_dir.mkdir(parents=True)
+        ...     _ = (config_dir / 'config.json').write_text('{}')
+        ...     exercises = Index(root / '.manage' / 'index.sqlite')
+        ...     exercises.refresh(root)
+        ...     before = exercises.query()[0].downloaded_at
+        ...     _ = (config_dir / 'metadata.json').write_text('{}')
+        ...     exercises.refresh(root)
+        ...     before, exercises.query()[0].downloaded_at is not None
+        (None, True)
+
+        :param root: Exercism workspace root
+        """
+        with timing.span('refresh', 'index'):
+            found = dict(_scan_exercises(root))
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT track, slug, user, config_mtime, metadata_mtime '
+                    'FROM exercises').fetchall()
+                known = {tuple(x[:3]): tuple(x[3:]) for x in rows}
+                changed = [(k, v) for k, v in found.items()
+                           if known.get(k) != v[1:]]
+                removed = [x for x in known if x not in found]
+                if not changed and not removed:
+                    return
+                self._db.execute('BEGIN')
+                try:
+                    self._db.executemany(
+                        'DELETE FROM exercises '
+                        'WHERE track = ? AND slug = ? AND user = ?', removed)
+                    self._db.executemany(
+                        'INSERT INTO exercises '
+                        '(track, slug, user, blurb, solution_files, '
+                        'test_files, config_mtime, metadata_mtime, '
+                        'downloaded_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT DO UPDATE SET '
+                        'blurb = excluded.blurb, '
+                        'solution_files = excluded.solution_files, '
+                        'test_files = excluded.test_files, '
+                        'config_mtime = excluded.config_mtime, '
+                        'metadata_mtime = excluded.metadata_mtime, '
+                        'downloaded_at = coalesce(downloaded_at, '
+                        'excluded.downloaded_at)',
+                        [(*k, *_read_config(v[0]), *v[1:],
+                          v[2] / 1e9 if v[2] else None)
+                         for k, v in changed])
+                    self._db.execute('COMMIT')
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+
+    def query(self, track: Optional[str] = None, user: Optional[str] = None,
+              patterns: Optional[list[str]] = None, failing: bool = False,
+              not_submitted: bool = False) -> list[Entry]:
+        """Return exercises matching all given filters.
+
+        :param track: only exercises of this track
+        :param user: only solutions of this user
+        :param patterns: only slugs matching any of these glob patterns
+        :param failing: only exercises whose last test run failed
+        :param not_submitted: only exercises not submitted with the script
+        :return: exercises ordered by user, track and slug
+        """
+        conditions = []
+        values: list[str] = []
+        if track:
+            conditions.append('e.track = ?')
+            values.append(track)
+        if user is not None:
+            conditions.append('e.user = ?')
+            values.append(user)
+        if patterns:
+            conditions.append(
+                '(' + ' OR '.join('e.slug GLOB ?' for _ in patterns) + ')')
+            values.extend(patterns)
+        if failing:
+            conditions.append('r.passed = 0')
+        if not_submitted:
+            conditions.append('e.submitted_at IS NULL')
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT e.track, e.slug, e.user, e.blurb, e.downloaded_at, '
+                'e.submitted_at, r.passed, r.recorded_at '
+                'FROM exercises e LEFT JOIN results r '
+                'ON r.track = e.track AND r.slug = e.slug '
+                'AND r.user = e.user AND r.command = \'test\' '
+                'WHERE e.config_mtime IS NOT NULL' +
+                ''.join(f' AND {x}' for x in conditions) +
+                ' ORDER BY e.user, e.track, e.slug', values).fetchall()
+        return [Entry(track=x[0], slug=x[1], user=x[2], blurb=x[3],
+                      downloaded_at=x[4], submitted_at=x[5],
+                      passed=None if x[6] is None else bool(x[6]),
+                      tested_at=x[7]) for x in rows]
+
+    def get_result(self, exercise: Exercise,
+                   command: str) -> Optional[tuple[str, bool]]:
+        """Return the last recorded result of a command.
+
+        :param exercise: exercise the command ran for
+        :param command: name of the command
+        :return: (digest of the inputs, whether it passed) or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT digest, passed FROM results '
+                'WHERE track = ? AND slug = ? AND user = ? AND command = ?',
+                (*_key(exercise), command)).fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+    def add_result(self, exercise: Exercise, command: str, digest: str,
+                   passed: bool) -> None:
+        """Record the result of a command.
+
+        :param exercise: exercise the command ran for
+        :param command: name of the command
+        :param digest: digest of the inputs of the command
+        :param passed: whether the command passed
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results '
+                '(track, slug, user, command, digest, passed, recorded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (*_key(exercise), command, digest, passed, time.time()))
+
+
+def get_index() -> Index:
+    """Return the index of the current workspace."""
+    return _open_index(workspace.get_state_dir() / 'index.sqlite')
+
+
+@functools.lru_cache(maxsize=None)
+def _open_index(path: Path) -> Index:
+    return Index(path)
+
+
+def _scan_exercises(root: Path) -> Iterator[
+        tuple[tuple[str, str, str], tuple[str, int, Optional[int]]]]:
+    """Yield exercises of own and user solutions with their config mtimes.
+
+    Paths are handled as strings, as this runs for every exercise of the
+    workspace on each refresh.
+
+    :param root: Exercism workspace root
+    :return: iterator of ((track, slug, user),
+                          (config file, config mtime, metadata mtime))
+    """
+    track_dirs = [('', x) for x in _list_dirs(str(root))
+                  if x.name != 'users']
+    for user_dir in _list_dirs(os.path.join(root, 'users')):
+        track_dirs.extend((user_dir.name, x)
+                          for x in _list_dirs(user_dir.path))
+    for user, track_dir in track_dirs:
+        for exercise_dir in _list_dirs(track_dir.path):
+            config_dir = os.path.join(exercise_dir.path, '.exercism')
+            config_file = os.path.join(config_dir, 'config.json')
+            try:
+                config_mtime = os.stat(config_file).st_mtime_ns
+            except OSError:
+                continue
+            try:
+                metadata_mtime: Optional[int] = os.stat(
+                    os.path.join(config_dir, 'metadata.json')).st_mtime_ns
+            except OSError:
+                metadata_mtime = None
+            yield ((track_dir.name, exercise_dir.name, user),
+                   (config_file, config_mtime, metadata_mtime))
+
+
+def _list_dirs(path: str) -> list[os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as entries:
+            return [x for x in entries
+                    if x.is_dir() and not x.name.startswith('.')]
+    except OSError:
+        return []
+
+
+def _read_config(config_file: str) -> tuple[str, str, str]:
+    """Return blurb, solution and test files from an Exercism config."""
+    try:
+        with open(config_file) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = None
+    if not isinstance(config, dict):
+        config = {}
+    files = config.get('files')
+    if not isinstance(files, dict):
+        files = {}
+    return (str(config.get('blurb', '')),
+            json.dumps(files.get('solution', [])),
+            json.dumps(files.get('test', [])))
+
+
+def _key(exercise: Exercise) -> tuple[str, str, str]:
+    return (str(exercise.track), exercise.name, exercise.user or '')
+
+
+def _get_metadata_mtime(exercise: Exercise) -> Optional[int]:
+    try:
+        return (exercise.path / '.exercism' /
+                'metadata.json').stat().st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,57 @@
+"""List local exercises of the workspace from its index."""
+
+from __future__ import annotations
+
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Optional
+
+import common
+import index
+import workspace
+
+
+class ListCommand(common.WorkspaceCommand):
+    """List local exercises with their last test results."""
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'list'
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add filters of the listing."""
+        parser.add_argument('--failing', action='store_true',
+                            help='only exercises whose tests failed last')
+        parser.add_argument('--not-submitted', action='store_true',
+                            help='only exercises not submitted with this '
+                                 'script')
+
+    def run(self, namespace: Namespace) -> None:
+        """Run the command."""
+        exercises = index.get_index()
+        exercises.refresh(workspace.get_root())
+        entries = exercises.query(track=namespace.track,
+                                  user=namespace.user,
+                                  patterns=namespace.exercise,
+                                  failing=namespace.failing,
+                                  not_submitted=namespace.not_submitted)
+        if not entries:
+            common.echo('no exercises match')
+            return
+        rows = [(x.track,
+                 f'{x.user}/{x.slug}' if x.user else x.slug,
+                 '-' if x.passed is None else 'PASS' if x.passed else 'FAIL',
+                 _format_time(x.submitted_at),
+                 x.blurb) for x in entries]
+        widths = [max((len(x[i]) for x in rows), default=0)
+                  for i in range(4)]
+        common.echo('\n'.join(
+            '  '.join(x.ljust(w) for x, w in zip(row, widths)) +
+            '  ' + row[4] for row in rows))
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return '-'
+    return time.strftime('%Y-%m-%d', time.localtime(timestamp))
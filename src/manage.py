@@ -2,57 +2,153 @@
 
 from __future__ import annotations
 
-import inspect
+import contextlib
+import fnmatch
+import importlib
 import sys
 from argparse import ArgumentError, ArgumentParser, Namespace
-from subprocess import CalledProcessError
-from typing import Any, Optional
+from pathlib import Path
+from subprocess import CalledProcessError, TimeoutExpired
+from typing import Any, Optional, Sequence, Union
 
-from common import Command, DownloadCommand, Track, get_default_commands
+import batch
+import report
+import timing
+import workspace
+from common import (Command, DownloadCommand, Failed, Track, WorkspaceCommand,
+                    get_default_commands)
+from compare import CompareCommand
 from exercise import Exercise
-from track_c import CTrack
-from track_python import PythonTrack
-from track_rust import RustTrack
+from listing import ListCommand
+from slowest import SlowestCommand
+from watch import WatchCommand
 
-TRACKS = [CTrack(), PythonTrack(), RustTrack()]
+# Tracks by name, with the class implementing them. Track modules are
+# imported only when selected, as some have slow dependencies.
+TRACKS = {'c': 'track_c.CTrack',
+          'python': 'track_python.PythonTrack',
+          'rust': 'track_rust.RustTrack'}
+
+_DOWNLOAD_JOBS = 4
+
+# Help texts by class, generated from docstrings.
+_HELP: dict[type, Optional[str]] = {}
 
 
 def main() -> None:
     """Run script with given arguments."""
     namespace: Namespace
     parser: ArgumentParser
-    track = parse_track()
-    commands = get_default_commands() + (track.commands if track else [])
-    namespace, parser = parse_args(commands)
-    [command] = [x for x in commands if x.name == namespace.command]
+    options = parse_known_args()
+    if options.timings or options.profile:
+        timing.start()
+    profiler = None
+    if options.profile and options.profile.suffix != '.json':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with timing.span('import track', 'startup'):
+            track = (get_track(options.track) if options.track in TRACKS
+                     else None)
+        commands: list[Union[Command, WorkspaceCommand]] = [
+            *get_default_commands(), *(track.commands if track else []),
+            CompareCommand()]
+        commands += [WatchCommand(x) for x in commands
+                     if isinstance(x, Command) and x.name == 'test']
+        commands += [ListCommand(), SlowestCommand()]
+        with timing.span('parse arguments', 'startup'):
+            namespace, parser = parse_args(commands, options.command)
+        [command] = [x for x in commands if x.name == namespace.command]
+        if isinstance(command, WorkspaceCommand):
+            command.run(namespace)
+        else:
+            run(track, command, namespace, parser)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(options.profile)
+        if options.timings or options.profile:
+            spans = timing.stop()
+            if options.timings:
+                timing.print_report(spans)
+            if options.profile and options.profile.suffix == '.json':
+                timing.write_trace(spans, options.profile)
+
 
+def run(track: Optional[Track], command: Command, namespace: Namespace,
+        parser: ArgumentParser) -> None:
+    """Run the command for the selected exercises.
+
+    :param track: selected track
+    :param command: selected command
+    :param namespace: parsed arguments
+    :param parser: parser to report argument errors with
+    """
     try:
         assert track
-        exercise = Exercise(track, namespace)
-        if command.needs_download() and not exercise.is_downloaded():
-            DownloadCommand().run(exercise)
-        command.run(exercise)
+        exercises = [Exercise(track, namespace, x)
+                     for x in get_exercise_names(track, namespace)]
+        if isinstance(command, WatchCommand) and len(exercises) > 1:
+            raise ArgumentError(None, 'watch a single exercise at a time')
+        with contextlib.ExitStack() as stack:
+            on_result: Optional[batch.Listener] = None
+            if namespace.report:
+                on_result = stack.enter_context(report.open_report(
+                    namespace.report,
+                    namespace.report_file or
+                    Path(report.FORMATS[namespace.report]))).add
+            if isinstance(command, DownloadCommand) and namespace.many:
+                results = batch.download(command, exercises,
+                                         namespace.jobs or _DOWNLOAD_JOBS)
+                if on_result:
+                    for result in results:
+                        on_result(result)
+            elif len(exercises) == 1 and not on_result:
+                [exercise] = exercises
+                if command.needs_download() and \
+                        not exercise.is_downloaded():
+                    DownloadCommand().run(exercise)
+                batch.run_incremental(command, exercise)
+                return
+            else:
+                results = batch.run(command, exercises,
+                                    namespace.jobs or command.default_jobs(),
+                                    on_result=on_result)
+        batch.print_summary(results)
+        if not all(x.passed for x in results):
+            exit(1)
     except ArgumentError as e:
         parser.error(e.message)
     except CalledProcessError:
         exit(1)
+    except Failed as e:
+        parser.exit(1, f'{e}\n')
+    except TimeoutExpired as e:
+        parser.exit(1, f'{Path(e.cmd[0]).name} timed out after '
+                       f'{e.timeout:.0f}s\n')
 
 
-def parse_args(commands: list[Command]) -> tuple[Namespace, ArgumentParser]:
+def parse_args(commands: Sequence[Union[Command, WorkspaceCommand]],
+               command_name: Optional[str] = None
+               ) -> tuple[Namespace, ArgumentParser]:
     """Parse all command line arguments.
 
+    Track and exercise selection are optional filters for workspace
+    commands, and required for all others.
+
     :param commands: commands to serve through the command line
+    :param command_name: build arguments for only this command if given
     :return: (parsed arguments, parser)
     """
     parser = ArgumentParser(description='Manage Exercism solutions.')
-    parser.add_argument('-t', '--track', required=True,
-                        choices=[x.name for x in TRACKS],
-                        help='language track')
-    parser.add_argument('-e', '--exercise', required=True,
-                        help='exercise slug')
-    parser.add_argument('-u', '--user', help='operate for mentee solutions')
+    add_global_arguments(parser, required=not any(
+        isinstance(x, WorkspaceCommand) and x.name == command_name
+        for x in commands))
     subparsers = parser.add_subparsers(
         title='commands', dest='command', required=True)
+    if command_name in [x.name for x in commands]:
+        commands = [x for x in commands if x.name == command_name]
     for command in commands:
         subparser = subparsers.add_parser(command.name, help=get_help(command))
         command.add_arguments(subparser)
@@ -60,26 +156,106 @@ def parse_args(commands: list[Command]) -> tuple[Namespace, ArgumentParser]:
     return namespace, parser
 
 
-def parse_track() -> Optional[Track]:
-    """Parse just the track argument.
+def add_global_arguments(parser: ArgumentParser, required: bool = True,
+                         validate: bool = True) -> None:
+    """Add arguments common to all commands.
 
-    :return: (parsed arguments, parser)
+    :param parser: parser to add the arguments to
+    :param required: whether to require track and exercise selection
+    :param validate: whether to reject unknown tracks
+    """
+    parser.add_argument('-t', '--track', required=required,
+                        choices=list(TRACKS) if validate else None,
+                        help='language track')
+    selection = parser.add_mutually_exclusive_group(required=required)
+    selection.add_argument('-e', '--exercise', action='extend',
+                           type=lambda x: [y for y in x.split(',') if y],
+                           help='exercise slug or glob pattern, repeat or '
+                                'separate with commas for many')
+    selection.add_argument('--all', action='store_true',
+                           help='select all local exercises of the track')
+    parser.add_argument('-u', '--user', help='operate for mentee solutions')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='run even if inputs did not change since the '
+                             'last successful run')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of exercises to run concurrently')
+    parser.add_argument('--timeout', type=float,
+                        help='seconds after which a process started by the '
+                             'command is killed')
+    parser.add_argument('--report', choices=list(report.FORMATS),
+                        help='write a record for each exercise in this '
+                             'format')
+    parser.add_argument('--report-file', type=Path,
+                        help='path of the report, report.jsonl or '
+                             'report.xml by default')
+    parser.add_argument('--timings', action='store_true',
+                        help='print time spent in each phase')
+    parser.add_argument('--profile', type=Path,
+                        help='write cProfile stats, or a Chrome trace if '
+                             'the file name ends with .json')
+
+
+def get_exercise_names(track: Track, namespace: Namespace) -> list[str]:
+    """Resolve exercise slugs selected on the command line.
+
+    Glob patterns and --all are matched against the local exercises of the
+    track. Plain slugs are kept as is so that they can be downloaded.
+
+    :param track: track of the exercises
+    :param namespace: parsed arguments
+    :return: unique exercise slugs in selection order
+    """
+    if namespace.all:
+        names = workspace.list_exercises(track.name, namespace.user)
+        if not names:
+            raise ArgumentError(None, f'no local exercises for {track}')
+        return names
+    local: Optional[list[str]] = None
+    names = []
+    for pattern in namespace.exercise:
+        if not any(x in pattern for x in '*?['):
+            names.append(pattern)
+            continue
+        if local is None:
+            local = workspace.list_exercises(track.name, namespace.user)
+        matches = fnmatch.filter(local, pattern)
+        if not matches:
+            raise ArgumentError(None, f'no exercise matches "{pattern}"')
+        names.extend(matches)
+    return list(dict.fromkeys(names))
+
+
+def parse_known_args() -> Namespace:
+    """Parse just the global arguments and the command name.
+
+    :return: parsed arguments, without the ones specific to the command
     """
     parser = ArgumentParser(add_help=False)
-    parser.add_argument('-t', '--track', choices=[x.name for x in TRACKS])
+    add_global_arguments(parser, required=False, validate=False)
+    parser.add_argument('command', nargs='?')
     namespace, _ = parser.parse_known_args(sys.argv[1:])
-    if namespace.track:
-        [track] = [x for x in TRACKS if x.name == namespace.track]
-        return track
-    return None
+    return namespace
+
+
+def get_track(name: str) -> Track:
+    """Import the module of a track and return the track.
+
+    :param name: name of the track
+    """
+    module, class_name = TRACKS[name].rsplit('.', 1)
+    track: Track = getattr(importlib.import_module(module), class_name)()
+    return track
 
 
 def get_help(obj: Any) -> Optional[str]:
     """Generate command line help from docstring of object."""
-    docstring = inspect.getdoc(obj)
-    if not docstring:
-        return None
-    return ''.join(docstring.splitlines()[:1]).strip().rstrip('.').lower()
+    cls = type(obj)
+    if cls not in _HELP:
+        docstring = next((x.__doc__ for x in cls.__mro__ if x.__doc__), None)
+        _HELP[cls] = (''.join(docstring.splitlines()[:1])
+                      .strip().rstrip('.').lower() if docstring else None)
+    return _HELP[cls]
 
 
 if __name__ == '__main__':
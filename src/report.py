@@ -0,0 +1,148 @@
+"""Machine readable reports of batch runs."""
+
+from __future__ import annotations
+
+import abc
+import json
+import threading
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from batch import Result
+
+# Report formats by name, with their default file names.
+FORMATS = {'jsonl': 'report.jsonl', 'junit': 'report.xml'}
+
+
+class Report(metaclass=abc.ABCMeta):
+    """Report written one exercise at a time as results come."""
+
+    def __init__(self, path: Path):
+        """Create the report file.
+
+        :param path: path of the report file
+        """
+        self._lock = threading.Lock()
+        self._file: IO[str] = path.open('w')
+        self._start()
+
+    def add(self, result: Result) -> None:
+        """Write the result of an exercise to the report.
+
+        :param result: result of a command for an exercise
+        """
+        with self._lock:
+            self._write(result)
+            self._file.flush()
+
+    def close(self) -> None:
+        """Finish and close the report file."""
+        with self._lock:
+            self._finish()
+            self._file.close()
+
+    def __enter__(self) -> Report:
+        """Return the report."""
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Finish and close the report file."""
+        self.close()
+
+    def _start(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def _write(self, result: Result) -> None:
+        pass
+
+    def _finish(self) -> None:
+        pass
+
+
+class JsonLinesReport(Report):
+    """Report with a JSON object on each line."""
+
+    def _write(self, result: Result) -> None:
+        self._file.write(json.dumps(to_dict(result)) + '\n')
+
+
+class JUnitReport(Report):
+    """JUnit XML report with a test suite for each exercise.
+
+    Each suite holds a single test case for the command itself. Counts of
+    tests parsed from the tool output are kept as properties of the suite.
+    """
+
+    def _start(self) -> None:
+        self._file.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                         '<testsuites>\n')
+
+    def _write(self, result: Result) -> None:
+        suite = ElementTree.Element('testsuite', {
+            'name': f'{result.exercise.track}/{result.exercise}',
+            'tests': '1',
+            'failures': str(int(not result.passed)),
+            'skipped': str(int(result.cached)),
+            'time': f'{result.duration:.3f}'})
+        tests = result.tests
+        if tests:
+            properties = ElementTree.SubElement(suite, 'properties')
+            for name in ['passed', 'failed', 'ignored']:
+                ElementTree.SubElement(properties, 'property', {
+                    'name': f'tests.{name}',
+                    'value': str(getattr(tests, name))})
+        case = ElementTree.SubElement(suite, 'testcase', {
+            'classname': f'{result.exercise.track}.{result.exercise}',
+            'name': result.command,
+            'time': f'{result.duration:.3f}'})
+        if result.cached:
+            ElementTree.SubElement(case, 'skipped', {
+                'message': 'up to date'})
+        elif not result.passed:
+            ElementTree.SubElement(case, 'failure', {
+                'message': result.error or 'failed'})
+        ElementTree.indent(suite, '  ', level=1)
+        self._file.write('  ' + ElementTree.tostring(suite, 'unicode') +
+                         '\n')
+
+    def _finish(self) -> None:
+        self._file.write('</testsuites>\n')
+
+
+def open_report(format: str, path: Path) -> Report:
+    """Create a report file of the given format.
+
+    :param format: name of the format, one of FORMATS
+    :param path: path of the report file
+    """
+    if format == 'junit':
+        return JUnitReport(path)
+    return JsonLinesReport(path)
+
+
+def to_dict(result: Result) -> dict[str, Any]:
+    """Return the result as a JSON compatible record.
+
+    :param result: result of a command for an exercise
+    """
+    tests = result.tests
+    memory = result.memory
+    return {'track': str(result.exercise.track),
+            'exercise': result.exercise.name,
+            'user': result.exercise.user,
+            'command': result.command,
+            'passed': result.passed,
+            'cached': result.cached,
+            'duration': round(result.duration, 3),
+            'exit_status': result.exit_status,
+            'error': result.error,
+            'tests': {'passed': tests.passed,
+                      'failed': tests.failed,
+                      'ignored': tests.ignored} if tests else None,
+            'memory': {'errors': memory.errors,
+                       'leaked_bytes': memory.leaked_bytes,
+                       'leaked_blocks': memory.leaked_blocks}
+            if memory else None}
@@ -0,0 +1,184 @@
+"""Long running process serving script invocations over a Unix socket.
+
+Clients are served one at a time. A command runs with the working
+directory, environment and standard streams of its client, which are all
+shared by the threads of the process, so a client waits until the command
+of the previous one has finished.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional
+
+import client
+import common
+import manage
+
+# Held while standard streams are switched between the server and a client.
+_streams_lock = threading.Lock()
+
+# Scope of the command running with standard streams of a client.
+_client_scope: Optional[common.CancelScope] = None
+
+
+class Handler(socketserver.BaseRequestHandler):
+    """Run a single script invocation sent by a client."""
+
+    _MAX_REQUEST = 1 << 20
+
+    def handle(self) -> None:
+        """Read request, run the script and reply with its exit code.
+
+        Requests are only accepted from processes of the same user, as they
+        run with the environment and streams sent by the client.
+        """
+        if client.get_peer_uid(self.request) != os.getuid():
+            return
+        data, fds, _, _ = socket.recv_fds(
+            self.request, Handler._MAX_REQUEST, 3)
+        scope = common.CancelScope()
+        try:
+            while data and not data.endswith(b'\n'):
+                chunk = self.request.recv(Handler._MAX_REQUEST)
+                if not chunk:
+                    return
+                data += chunk
+            if len(fds) != 3 or not data:
+                return
+            request = json.loads(data)
+            threading.Thread(target=self.__cancel_on_hangup, args=(scope,),
+                             daemon=True).start()
+            code = run(request['argv'], request['cwd'], request['env'], fds,
+                       scope)
+        finally:
+            for fd in fds:
+                os.close(fd)
+        if not scope.cancelled:
+            self.request.sendall(json.dumps({'exit': code}).encode() + b'\n')
+
+    def __cancel_on_hangup(self, scope: common.CancelScope) -> None:
+        """Cancel the command if the client stops waiting for it.
+
+        Clients send nothing after the request, so reading returns only
+        when the connection is closed. Output of the server is dropped from
+        then on, instead of being written to the terminal of the client.
+        """
+        with contextlib.suppress(OSError):
+            while self.request.recv(1):
+                pass
+        with _streams_lock:
+            scope.cancel()
+            if _client_scope is not scope:
+                return
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            for fd in (1, 2):
+                os.dup2(devnull, fd)
+            os.close(devnull)
+
+
+def run(argv: list[str], cwd: str, env: dict[str, str],
+        fds: list[int], scope: Optional[common.CancelScope] = None) -> int:
+    """Run the script as if it was started by the client.
+
+    Caches of this process are kept between runs. All of them are validated
+    against modification times of the files they are built from.
+
+    :param argv: command line arguments of the client
+    :param cwd: working directory of the client
+    :param env: environment variables of the client
+    :param fds: standard input, output and error of the client
+    :param scope: scope to start processes of the command in
+    :return: exit code
+    """
+    global _client_scope
+    saved_fds = [os.dup(x) for x in range(3)]
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    saved_argv = sys.argv
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        with _streams_lock:
+            for i, fd in enumerate(fds):
+                os.dup2(fd, i)
+            _client_scope = scope
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        sys.argv = [manage.__file__, *argv]
+        try:
+            with scope or contextlib.nullcontext():
+                manage.main()
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except common.Cancelled:
+            return 130
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+    finally:
+        with contextlib.suppress(OSError):
+            sys.stdout.flush()
+            sys.stderr.flush()
+        with _streams_lock:
+            _client_scope = None
+            for i, fd in enumerate(saved_fds):
+                os.dup2(fd, i)
+                os.close(fd)
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        sys.argv = saved_argv
+
+
+def main() -> None:
+    """Serve script invocations one at a time until interrupted."""
+    parser = ArgumentParser(
+        description='Serve Exercism solution management to thin clients.')
+    parser.add_argument('--socket', type=Path,
+                        default=client.get_socket_path(),
+                        help='path of the Unix socket to listen on, in a '
+                             'directory only this user can access')
+    namespace = parser.parse_args(sys.argv[1:])
+    path: Path = namespace.socket
+    if not hasattr(socket, 'SO_PEERCRED'):
+        parser.error('serving needs peer credentials of Unix sockets, '
+                     'which this platform does not provide')
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not client.is_private(path.parent):
+        parser.error(f'{path.parent} must be a directory that only this '
+                     'user can access')
+    if path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with probe:
+            if probe.connect_ex(str(path)) == 0:
+                parser.error(f'a server is already listening on {path}')
+        path.unlink()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with socketserver.UnixStreamServer(str(path), Handler) as server:
+        print(f'serving on {path}', flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    main()
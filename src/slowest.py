@@ -0,0 +1,95 @@
+"""Rank tests by their recorded durations and find regressions."""
+
+from __future__ import annotations
+
+import fnmatch
+from argparse import ArgumentParser, Namespace
+from typing import Optional
+
+import common
+import history
+
+
+class SlowestCommand(common.WorkspaceCommand):
+    """Show the slowest tests and the tests that got slower."""
+
+    # Regressions shorter than this many seconds are noise.
+    _MIN_REGRESSION = 0.01
+
+    # Number of earlier runs whose median is compared to the latest.
+    _BASELINE_RUNS = 5
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'slowest'
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add size of the listing and regression threshold."""
+        parser.add_argument('--top', type=int, default=10,
+                            help='number of tests and exercises to show')
+        parser.add_argument('--regression', type=float, default=1.5,
+                            help='ratio to the median of earlier runs from '
+                                 'which a test is reported as slower')
+
+    def run(self, namespace: Namespace) -> None:
+        """Run the command.
+
+        Durations of the latest run of each exercise are ranked, and
+        compared to the median of the earlier runs of the same test. Tests
+        missing from the latest run, such as renamed ones, are left out.
+        """
+        runs: dict[tuple[str, str, Optional[str]], history.Run] = {}
+        earlier: dict[tuple[tuple[str, str, Optional[str]], str],
+                      list[float]] = {}
+        for run in history.read():
+            if not self.__matches(run, namespace):
+                continue
+            last = runs.get(run.key)
+            for test, seconds in (last.durations if last else {}).items():
+                previous = earlier.setdefault((run.key, test), [])
+                previous.append(seconds)
+                del previous[:-SlowestCommand._BASELINE_RUNS]
+            runs[run.key] = run
+        if not runs:
+            common.echo('no test durations recorded, run tests first')
+            return
+        latest = {(key, test): seconds
+                  for key, run in runs.items()
+                  for test, seconds in run.durations.items()}
+        totals = {key: sum(run.durations.values())
+                  for key, run in runs.items()}
+        top = namespace.top
+        lines = ['slowest tests:']
+        for (key, test), seconds in sorted(
+                latest.items(), key=lambda x: -x[1])[:top]:
+            lines.append(f'  {seconds:8.3f}s  {runs[key]}  {test}')
+        lines.append('slowest exercises:')
+        for key, seconds in sorted(totals.items(),
+                                   key=lambda x: -x[1])[:top]:
+            lines.append(f'  {seconds:8.3f}s  {runs[key]}')
+        regressions = []
+        for (key, test), seconds in latest.items():
+            if (key, test) not in earlier:
+                continue
+            durations = sorted(earlier[key, test])
+            baseline = durations[len(durations) // 2]
+            if seconds >= baseline * namespace.regression and \
+                    seconds - baseline >= SlowestCommand._MIN_REGRESSION:
+                regressions.append((seconds - baseline, baseline, seconds,
+                                    str(runs[key]), test))
+        if regressions:
+            lines.append('slower than before:')
+            for _, baseline, seconds, exercise, test in sorted(
+                    regressions, reverse=True)[:top]:
+                lines.append(f'  {baseline:8.3f}s -> {seconds:.3f}s  '
+                             f'{exercise}  {test}')
+        common.echo('\n'.join(lines))
+
+    def __matches(self, run: history.Run, namespace: Namespace) -> bool:
+        if namespace.track and run.track != namespace.track:
+            return False
+        if namespace.user is not None and run.user != namespace.user:
+            return False
+        return not namespace.exercise or any(
+            fnmatch.fnmatchcase(run.exercise, x) for x in namespace.exercise)
@@ -0,0 +1,61 @@
+"""Tests of batch runs on workspaces generated by the benchmarks."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+import batch
+import benchmark
+import common
+from exercise import Exercise
+from track_python import PythonTrack, TestCommand
+
+
+@pytest.fixture
+def exercises() -> Iterator[list[Exercise]]:
+    """Yield two generated Python exercises with the stub CLI on PATH."""
+    with benchmark.scratch():
+        track = PythonTrack()
+        namespace = benchmark.make_namespace()
+        namespace.numprocesses = None
+        yield [Exercise(track, namespace, x)
+               for x in benchmark.make_workspace(track, 2)]
+
+
+def test_run_many_times_out_each_exercise(
+        exercises: list[Exercise]) -> None:
+    """Exercises whose tests do not finish in time fail with the timeout."""
+    exercises[0].namespace.timeout = 1
+    exercises[0].test_files[0].write_text(
+        'import time\ndef test_hang():\n    time.sleep(60)\n')
+    results = batch.run_many(TestCommand(), exercises)
+    assert [x.error for x in results] == ['timed out after 1s'] * 2
+
+
+def test_submit_skips_unchanged_solution(
+        exercises: list[Exercise]) -> None:
+    """Solutions are uploaded again only if they changed or are forced."""
+    exercise = exercises[0]
+    submissions = []
+    for force in [False, False, True]:
+        exercise.namespace.force = force
+        assert batch.run_one(common.SubmitCommand(), exercise).passed
+        submissions.append(len(_read_submissions()))
+    assert submissions == [1, 1, 2]
+    exercise.solution_files[0].write_text('def solve():\n    return 1\n')
+    exercise.namespace.force = False
+    batch.run_one(common.SubmitCommand(), exercise)
+    assert len(_read_submissions()) == 3
+
+
+def _read_submissions() -> list[str]:
+    """Return files of each submission through the stub CLI, if any."""
+    log = Path(os.environ['EXERCISM_CONFIG_HOME']) / 'submissions.log'
+    try:
+        return log.read_text().splitlines()
+    except FileNotFoundError:
+        return []
@@ -0,0 +1,115 @@
+"""Lightweight timing of script phases."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+class Span:
+    """Timed phase of the script."""
+
+    def __init__(self, name: str, category: str, start: float,
+                 duration: float, thread: int):
+        """Create span.
+
+        :param name: name of the phase, such as the program of a subprocess
+        :param category: kind of the phase, such as subprocess
+        :param start: performance counter at the start of the phase
+        :param duration: wall time of the phase in seconds
+        :param thread: identifier of the thread running the phase
+        """
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+
+
+_lock = threading.Lock()
+_spans: Optional[list[Span]] = None
+_start = 0.0
+
+
+def start() -> None:
+    """Start recording spans, dropping the ones recorded before."""
+    global _spans, _start
+    with _lock:
+        _spans = []
+        _start = time.perf_counter()
+
+
+def stop() -> list[Span]:
+    """Stop recording and return the recorded spans in start order."""
+    global _spans
+    with _lock:
+        spans, _spans = _spans or [], None
+    return sorted(spans, key=lambda x: x.start)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str) -> Iterator[None]:
+    """Record wall time of the enclosed block if recording.
+
+    :param name: name of the phase
+    :param category: kind of the phase
+    """
+    if _spans is None:
+        yield
+        return
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            if _spans is not None:
+                _spans.append(Span(name, category, begin, end - begin,
+                                   threading.get_ident()))
+
+
+def print_report(spans: list[Span]) -> None:
+    """Print total time and count of each phase.
+
+    Phases are listed in order of their first start. Wall time is measured
+    from the start of recording to the end of the last phase.
+
+    :param spans: recorded spans
+    """
+    totals: dict[tuple[str, str], list[float]] = {}
+    for x in spans:
+        total = totals.setdefault((x.category, x.name), [0.0, 0])
+        total[0] += x.duration
+        total[1] += 1
+    wall = max((x.start + x.duration for x in spans), default=_start) - _start
+    tools = sum(x.duration for x in spans if x.category == 'subprocess')
+    lines = ['', 'timings:', f'  {"seconds":>9}  {"count":>5}  phase']
+    for (category, name), (seconds, count) in totals.items():
+        lines.append(f'  {seconds:9.3f}  {count:5}  {category}: {name}')
+    lines.append(f'{wall:.3f}s wall, {tools:.3f}s in subprocesses')
+    print('\n'.join(lines), file=sys.stderr)
+
+
+def write_trace(spans: list[Span], path: Path) -> None:
+    """Write spans in Chrome trace event format.
+
+    The file can be opened on chrome://tracing or https://ui.perfetto.dev.
+
+    :param spans: recorded spans
+    :param path: path of the json file
+    """
+    events = [{'name': x.name,
+               'cat': x.category,
+               'ph': 'X',
+               'ts': round((x.start - _start) * 1e6),
+               'dur': round(x.duration * 1e6),
+               'pid': os.getpid(),
+               'tid': x.thread} for x in spans]
+    with path.open('w') as f:
+        json.dump({'traceEvents': events}, f)
@@ -1,10 +1,23 @@
 """Operations for the C track on Exercism."""
 
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
 import re
+import shlex
+import shutil
 import subprocess
+import threading
+from argparse import ArgumentParser
 from pathlib import Path
+from typing import Callable, Optional
 
 import common
+import history
+import timing
+import workspace
 from exercise import Exercise
 
 
@@ -20,50 +33,206 @@ class CTrack(common.Track):
     def commands(self) -> list[common.Command]:
         """List of commands specific to this track."""
         return [InitCommand(),
-                MakeCommand('build', 'tests.out'),
-                MakeCommand('test', 'test'),
+                MakeCommand('build', 'tests.out', cacheable=True),
+                MakeCommand('test', 'test', incremental=True,
+                            cacheable=True),
                 MakeCommand('clean', 'clean'),
-                MakeCommand('memcheck', 'memcheck')]
+                MemcheckCommand(),
+                LintCommand()]
 
     def post_download(self, exercise: Exercise) -> None:
         """Prepare solution after download for faster solve."""
         InitCommand().run(exercise)
 
 
-class InitCommand(common.Command):
-    """Uncomment all tests and create stub functions."""
+Function = tuple[str, str, str]
+
+_IGNORED_RE = re.compile(r'''
+      /\*.*?\*/              # block comment
+    | //[^\n]*               # line comment
+    | "(?:\\.|[^"\\\n])*"    # string literal
+    | '(?:\\.|[^'\\\n])*'    # character literal
+    | \#(?:\\\n|[^\n])*      # preprocessor line
+''', re.DOTALL | re.VERBOSE)
+_DELIMITER_RE = re.compile(r'[;{}]')
+_TOKEN_RE = re.compile(r'\w+|\S')
+
+_KEYWORDS = {'if', 'for', 'while', 'switch', 'return', 'sizeof', 'typedef'}
+_TYPE_KEYWORDS = {'void', 'char', 'short', 'int', 'long', 'float', 'double',
+                  'signed', 'unsigned', '_Bool', 'bool', '_Complex',
+                  'const', 'volatile', 'restrict'}
+_TAG_KEYWORDS = {'struct', 'union', 'enum'}
+
+
+def parse_functions(source: str, definitions: bool = True) -> list[Function]:
+    r"""Return functions declared or defined at top level of C source.
+
+    Comments, literals and preprocessor lines are stripped first. Source is
+    then split into declarations in a single pass, only the ones ending
+    with a parameter list are tokenized and bodies are not looked into.
+
+    >>> parse_functions('int add(int a, const int b[static 3]);')
+    [('int ', 'add', 'int a, const int b[static 3]')]
+    >>> parse_functions('#define F(x) x\n/* f(); */ '
+    ...                 'const char **hi(void) { if (1) { return "}"; } }')
+    [('const char **', 'hi', 'void')]
+    >>> parse_functions('int f(void); int g(void) { return 0; }',
+    ...                 definitions=False)
+    [('int ', 'f', 'void')]
+
+    :param source: content of a C header or source file
+    :param definitions: whether to include functions defined with a body
+    :return: list of (return type, name, parameters)
+    """
+    code = _IGNORED_RE.sub(' ', source)
+    functions = []
+    declaration = ''
+    depth = 0
+    start = 0
+    for match in _DELIMITER_RE.finditer(code):
+        text, start = code[start:match.start()], match.end()
+        delimiter = match.group()
+        if depth:
+            depth += {'{': 1, '}': -1}.get(delimiter, 0)
+            continue
+        if delimiter == '}':
+            # Closing brace of an extern "C" block.
+            declaration = ''
+            continue
+        declaration += text
+        function = (_get_function(_TOKEN_RE.findall(declaration))
+                    if declaration.rstrip().endswith(')') else None)
+        if function and (definitions or delimiter == ';'):
+            functions.append(function)
+        if delimiter == ';' or function or declaration.split() == ['extern']:
+            depth = 1 if function and delimiter == '{' else 0
+            declaration = ''
+        else:
+            # Skip bodies of structs, enums and initializers, but keep the
+            # declaration they are part of.
+            depth = 1
+    return functions
+
+
+def get_parameter_names(parameters: str) -> list[Optional[str]]:
+    """Return names of parameters in a parameter list.
+
+    >>> get_parameter_names('int a, const char *b[static 3], void (*f)(int)')
+    ['a', 'b', 'f']
+    >>> get_parameter_names('void')
+    []
+    >>> get_parameter_names('const char *, unsigned int, struct node *')
+    [None, None, None]
 
-    Function = tuple[str, str, str]
+    :param parameters: parameter list of a function without parentheses
+    :return: names, None for parameters declared without one
+    """
+    names: list[Optional[str]] = []
+    for parameter in _split_parameters(_tokenize(parameters)):
+        while parameter and parameter[-1] == ']':
+            del parameter[parameter.index('['):]
+        if parameter and parameter[-1] == ')':
+            # Function pointer, name is in the first parentheses.
+            start = parameter.index('(')
+            parameter = _split_parameters(parameter[start + 1:])[0]
+        words = [x for x in parameter if _is_word(x)]
+        if words == ['void'] and len(parameter) == 1:
+            continue
+        if not words or words[-1] in _TYPE_KEYWORDS or \
+                words[-1].endswith('_t') or \
+                (len(words) > 1 and words[-2] in _TAG_KEYWORDS) or \
+                (len(words) == 1 and parameter[:1] != ['*']):
+            names.append(None)
+        else:
+            names.append(words[-1])
+    return names
+
+
+def _tokenize(source: str) -> list[str]:
+    return _TOKEN_RE.findall(_IGNORED_RE.sub(' ', source))
+
+
+def _is_word(token: str) -> bool:
+    return token[0].isalnum() or token[0] == '_'
+
+
+def _get_function(declaration: list[str]) -> Optional[Function]:
+    if not declaration or declaration[-1] != ')':
+        return None
+    depth = 0
+    for i in range(len(declaration) - 1, -1, -1):
+        depth += {')': 1, '(': -1}.get(declaration[i], 0)
+        if not depth:
+            break
+    if depth or i < 2:
+        return None
+    name = declaration[i - 1]
+    return_type = declaration[:i - 1]
+    if not _is_word(name) or name in _KEYWORDS or \
+            not all(_is_word(x) or x == '*' for x in return_type) or \
+            any(x in _KEYWORDS for x in return_type):
+        return None
+    return (_render_type(return_type), name,
+            _render(declaration[i + 1:-1]))
 
-    _TYPE_RE = re.compile(r'(?:(?:const|unsigned|struct) )*\w+ \**')
-    _PARAM_RE = re.compile(
-        rf'{_TYPE_RE.pattern}(\w+)(?:\[(?:static )?.*?\])?')
-    _PARAMS_RE = re.compile(
-        rf'\((|void|{_PARAM_RE.pattern}(?:,[ \n\t]*{_PARAM_RE.pattern})*)\)',
-        re.DOTALL)
-    _FUNC_RE = re.compile(
-        rf'(?:\n|^)({_TYPE_RE.pattern})(\w+){_PARAMS_RE.pattern}(?:;|\s?{{)',
-        re.DOTALL)
+
+def _render_type(tokens: list[str]) -> str:
+    rendered = ''
+    for token in tokens:
+        if token == '*':
+            rendered += '*'
+        else:
+            rendered += (token if rendered.endswith(' ') or not rendered
+                         else f' {token}') + ' '
+    return rendered
+
+
+def _render(tokens: list[str]) -> str:
+    rendered = ''
+    previous = ''
+    for token in tokens:
+        if previous == ',' or (previous and _is_word(previous) and
+                               (_is_word(token) or token == '*')):
+            rendered += ' '
+        rendered += token
+        previous = token
+    return rendered
+
+
+def _split_parameters(tokens: list[str]) -> list[list[str]]:
+    parameters: list[list[str]] = [[]]
+    depth = 0
+    for token in tokens:
+        depth += {'(': 1, '[': 1, ')': -1, ']': -1}.get(token, 0)
+        if depth < 0:
+            # Closing parenthesis of the enclosing list.
+            break
+        if token == ',' and not depth:
+            parameters.append([])
+        else:
+            parameters[-1].append(token)
+    return [x for x in parameters if x]
+
+
+class InitCommand(common.Command):
+    """Uncomment all tests and create stub functions."""
 
     @property
     def name(self) -> str:
         """Name of the command."""
         return 'init'
 
-    def __functions(self, path: Path) -> list[Function]:
+    def __functions(self, path: Path,
+                    definitions: bool = True) -> list[Function]:
         with path.open() as f:
-            funcs = [x[:3]
-                     for x in re.findall(InitCommand._FUNC_RE, f.read())]
-            return [(x[0], x[1], re.sub(r'[\s\n]+', ' ', x[2]))
-                    for x in funcs]
+            return parse_functions(f.read(), definitions)
 
     def __stub_function(self, function: Function) -> str:
         stub = '\n'
         stub += '{}{}({}) {{\n'.format(*function)
         stub += '  // TODO: implement\n'
-        if function[2] and function[2] != 'void':
-            for param in re.findall(InitCommand._PARAM_RE, function[2]):
-                stub += f'  *(int *)(&{param}) = 0;\n'
+        for param in get_parameter_names(function[2]):
+            stub += f'  *(int *)(&{param}) = 0;\n'
         if function[0].strip() == 'void':
             stub += '  return;\n'
         else:
@@ -74,16 +243,21 @@ class InitCommand(common.Command):
     def __init_code(self, exercise: Exercise) -> None:
         h_file = exercise.find_file('*.h')
         c_file = exercise.find_file('*.c')
-        h_functions = self.__functions(h_file)
-        c_functions = self.__functions(c_file)
-        functions_to_add = [x for x in h_functions if x not in c_functions]
+        # Functions defined in the header, or static and inline ones, are not
+        # for the source file to define. Parameters without names cannot be
+        # referred to in a definition, so these functions are left alone.
+        h_functions = [
+            x for x in self.__functions(h_file, definitions=False)
+            if not {'static', 'inline'} & set(x[0].split()) and
+            None not in get_parameter_names(x[2])]
+        c_names = {x[1] for x in self.__functions(c_file)}
+        functions_to_add = [x for x in h_functions if x[1] not in c_names]
         if not functions_to_add:
             return
         with c_file.open('r') as f:
             content = f.read()
         content += ''.join(self.__stub_function(x) for x in functions_to_add)
-        with c_file.open('w') as f:
-            f.write(content)
+        common.write_file(c_file, content)
 
     def __init_tests(self, exercise: Exercise) -> None:
         for test_file in exercise.test_files:
@@ -91,33 +265,494 @@ class InitCommand(common.Command):
                 content = f.read()
             content = re.sub(r'(?<!// )TEST_IGNORE',
                              r'// TEST_IGNORE', content)
-            with test_file.open('w') as f:
-                f.write(content)
+            common.write_file(test_file, content)
 
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
-        self.__init_tests(exercise)
+        with timing.span('tests', 'init'):
+            self.__init_tests(exercise)
         if not exercise.user:
-            self.__init_code(exercise)
+            with timing.span('stubs', 'init'):
+                self.__init_code(exercise)
+
+
+# Summary line printed by Unity at the end of a test run.
+_UNITY_RESULT_RE = re.compile(r'^(\d+) Tests (\d+) Failures (\d+) Ignored')
+
+# Result line of a test printed by Unity, with its duration if Unity is built
+# with UNITY_INCLUDE_EXEC_TIME.
+_UNITY_TEST_RE = re.compile(r'^[^:\s]+:\d+:(\w+):(?:PASS|FAIL).*'
+                            r' \((\d+) ms\)$')
+
+# Flags for Unity to measure tests, it needs clock_gettime of POSIX.
+_DURATION_FLAGS = ['-DUNITY_INCLUDE_EXEC_TIME', '-D_POSIX_C_SOURCE=200809L']
+
+
+def parse_test_counts(line: str) -> Optional[common.TestCounts]:
+    """Return test counts on the summary line of Unity output.
+
+    >>> vars(parse_test_counts('5 Tests 1 Failures 2 Ignored '))
+    {'passed': 2, 'failed': 1, 'ignored': 2, 'duration': None}
+    >>> parse_test_counts('test_leap.c:12:test_leap_year:PASS') is None
+    True
+
+    :param line: line of test output
+    :return: counts, or None if this is not the summary line
+    """
+    match = _UNITY_RESULT_RE.match(line)
+    if not match:
+        return None
+    total, failed, ignored = (int(x) for x in match.groups())
+    return common.TestCounts(passed=total - failed - ignored,
+                             failed=failed, ignored=ignored)
+
+
+def parse_test_duration(line: str) -> Optional[tuple[str, float]]:
+    """Return name and seconds of a test on its result line.
+
+    >>> parse_test_duration('test_leap.c:12:test_leap_year:PASS (3 ms)')
+    ('test_leap_year', 0.003)
+    >>> parse_test_duration('test_leap.c:25:test_not_divisible_by_4:FAIL: '
+    ...                     'Expected FALSE Was TRUE (0 ms)')
+    ('test_not_divisible_by_4', 0.0)
+    >>> parse_test_duration('test_leap.c:12:test_leap_year:PASS') is None
+    True
+
+    :param line: line of test output
+    :return: name and duration, or None if the line has no duration
+    """
+    match = _UNITY_TEST_RE.match(line)
+    if not match:
+        return None
+    return match.group(1), int(match.group(2)) / 1000
 
 
 class MakeCommand(common.Command):
     """Run a single make target."""
 
-    def __init__(self, name: str, target: str):
+    def __init__(self, name: str, target: str, incremental: bool = False,
+                 cacheable: bool = False):
         """Create make command.
 
         :param name: name of the command
         :param target: make target
+        :param incremental: skip when sources did not change since last pass
+        :param cacheable: target can be built against the shared test
+            framework object instead of running make
         """
         self._name = name
         self._target = target
+        self._incremental = incremental
+        self._cacheable = cacheable
 
     @property
     def name(self) -> str:
         """Name of the command."""
         return self._name
 
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add option to build against the shared object cache."""
+        if self._cacheable:
+            parser.add_argument('--object-cache', action='store_true',
+                                help='compile the test framework once for '
+                                     'all exercises and link against it')
+        if self._target == 'test':
+            parser.add_argument('--durations', action='store_true',
+                                help='rebuild tests to measure each of '
+                                     'them and keep their durations')
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return sources, tests and the makefile."""
+        if not self._incremental:
+            return None
+        return (exercise.solution_files + exercise.test_files +
+                sorted(exercise.path.glob('[Mm]akefile')))
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return make and compiler versions with selected options."""
+        options = [f'--{x.replace("_", "-")}'
+                   for x in ['object_cache', 'durations']
+                   if getattr(exercise.namespace, x, False)]
+        return (common.get_tool_version('make', '--version') +
+                common.get_tool_version('cc', '--version') +
+                ' '.join(options))
+
     def run(self, exercise: Exercise) -> None:
-        """Run the command."""
-        subprocess.check_call(['make', self._target], cwd=exercise.path)
+        """Run the command, recording counts and durations of Unity tests."""
+        counts = common.TestCounts()
+        durations: dict[str, float] = {}
+
+        def parse(line: str) -> None:
+            common.echo(line)
+            tests = parse_test_counts(line)
+            if tests:
+                counts.add(tests)
+            duration = parse_test_duration(line)
+            if duration:
+                name, seconds = duration
+                durations[name] = seconds
+
+        result = self._make(exercise, self._target, parse,
+                            c_flags=_DURATION_FLAGS
+                            if getattr(exercise.namespace, 'durations', False)
+                            else None)
+        if counts.total:
+            common.record_tests(exercise, counts)
+        history.record(exercise, durations)
+        result.check()
+
+    def _make(self, exercise: Exercise, target: str,
+              on_line: Callable[[str], None],
+              asan_flags: Optional[list[str]] = None,
+              c_flags: Optional[list[str]] = None) -> common.ProcessResult:
+        """Build a make target, without make if using the object cache.
+
+        :param exercise: exercise to build
+        :param target: make target
+        :param on_line: handler of output lines
+        :param asan_flags: flags replacing ASANFLAGS of the makefile
+        :param c_flags: flags added to CFLAGS of the makefile, rebuilding
+            the target even if it is up to date
+        """
+        cached = self._cacheable and getattr(exercise.namespace,
+                                             'object_cache', False)
+        toolchain = get_toolchain(exercise) if cached or c_flags else None
+        if toolchain and cached:
+            toolchain = Toolchain(toolchain.cc,
+                                  toolchain.c_flags + (c_flags or []),
+                                  toolchain.libs,
+                                  toolchain.asan_flags if asan_flags is None
+                                  else asan_flags)
+            return self.__run_cached(exercise, target, toolchain, on_line,
+                                     rebuild=bool(c_flags))
+        args = ['make', target]
+        if toolchain and c_flags:
+            args.extend(['--always-make',
+                         f'CFLAGS={shlex.join(toolchain.c_flags + c_flags)}'])
+        if asan_flags is not None:
+            args.append(f'ASANFLAGS={shlex.join(asan_flags)}')
+        return common.run_process(args, cwd=exercise.path,
+                                  timeout=exercise.namespace.timeout,
+                                  on_line=on_line)
+
+    def __run_cached(self, exercise: Exercise, target: str,
+                     toolchain: Toolchain, on_line: Callable[[str], None],
+                     rebuild: bool = False) -> common.ProcessResult:
+        # Mirrors the tests.out and memcheck recipes of the track makefile,
+        # with the test framework compiled once into the object cache.
+        memcheck = target == 'memcheck'
+        flags = toolchain.asan_flags + toolchain.c_flags if memcheck else \
+            toolchain.c_flags
+        output = 'memcheck.out' if memcheck else 'tests.out'
+        sources = sorted(x.name for x in exercise.path.glob('*.c'))
+        timeout = exercise.namespace.timeout
+        if memcheck or rebuild or not _is_newer(exercise.path / output):
+            on_line(f'Compiling {output}')
+            framework = get_framework_object(exercise, toolchain.cc, flags)
+            result = common.run_process(
+                [*toolchain.cc, *flags, str(framework), *sources,
+                 '-o', output, *toolchain.libs],
+                cwd=exercise.path, timeout=timeout, on_line=on_line)
+            if result.returncode or target == 'tests.out':
+                return result
+        result = common.run_process([f'./{output}'], cwd=exercise.path,
+                                    timeout=timeout, on_line=on_line)
+        if memcheck and not result.returncode:
+            on_line('Memory check passed')
+        return result
+
+
+class MemcheckCommand(MakeCommand):
+    """Check tests for memory errors and leaks."""
+
+    def __init__(self) -> None:
+        """Create memcheck command."""
+        super().__init__('memcheck', 'memcheck', cacheable=True)
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add choice of the checker."""
+        super().add_arguments(parser)
+        parser.add_argument('--tool', choices=_MEMCHECK_TOOLS,
+                            default='make',
+                            help='check with the memcheck target of the '
+                                 'makefile, with address and undefined '
+                                 'behavior sanitizers, or with valgrind')
+
+    def default_jobs(self) -> int:
+        """Return number of processors, as checks are processor bound."""
+        return os.cpu_count() or 1
+
+    def run(self, exercise: Exercise) -> None:
+        """Run the check, recording test counts and memory errors."""
+        counts = common.TestCounts()
+        memory = common.MemoryErrors()
+
+        def parse(line: str) -> None:
+            common.echo(line)
+            tests = parse_test_counts(line)
+            if tests:
+                counts.add(tests)
+            memory.add(parse_memory_errors(line))
+
+        tool = getattr(exercise.namespace, 'tool', 'make')
+        if tool == 'valgrind':
+            result = self._make(exercise, 'tests.out', parse)
+            if not result.returncode:
+                result = common.run_process(
+                    ['valgrind', '--leak-check=full', '--error-exitcode=1',
+                     '--errors-for-leak-kinds=definite,indirect',
+                     './tests.out'],
+                    cwd=exercise.path, timeout=exercise.namespace.timeout,
+                    on_line=parse)
+                if not result.returncode:
+                    parse('Memory check passed')
+        else:
+            result = self._make(exercise, 'memcheck', parse,
+                                _SANITIZER_FLAGS if tool == 'sanitizers'
+                                else None)
+        if counts.total:
+            common.record_tests(exercise, counts)
+        if counts.total or memory.total or memory.leaked_blocks:
+            common.record_memory(exercise, memory)
+        result.check()
+
+
+_MEMCHECK_TOOLS = ['make', 'sanitizers', 'valgrind']
+
+# Replaces ASANFLAGS of the makefile for the sanitizers tool. Errors stop
+# the tests, so that undefined behavior fails the check as well.
+_SANITIZER_FLAGS = ['-fsanitize=address,undefined',
+                    '-fno-sanitize-recover=all', '-fno-common',
+                    '-fno-omit-frame-pointer']
+
+# Findings of sanitizers and valgrind, one per line of their reports.
+_ASAN_ERROR_RE = re.compile(r'^==\d+==ERROR: AddressSanitizer: ([\w-]+)')
+_ASAN_LEAK_RE = re.compile(r'^SUMMARY: \w+Sanitizer: (\d+) byte\(s\) '
+                           r'leaked in (\d+) allocation')
+_UBSAN_ERROR_RE = re.compile(r': runtime error: ([^:]*)')
+_VALGRIND_ERROR_RE = re.compile(
+    r'^==\d+== (Invalid (?:read|write|free)|Mismatched free|'
+    r'Conditional jump or move depends on uninitialised value|'
+    r'Use of uninitialised value|Syscall param|'
+    r'Source and destination overlap)')
+_VALGRIND_LEAK_RE = re.compile(r'^==\d+== +(?:definitely|indirectly) lost: '
+                               r'([\d,]+) bytes in ([\d,]+) blocks')
+
+
+def parse_memory_errors(line: str) -> common.MemoryErrors:
+    """Return memory errors reported on a line of checker output.
+
+    >>> vars(parse_memory_errors(
+    ...     '==7==ERROR: AddressSanitizer: heap-buffer-overflow on address'))
+    {'errors': {'heap-buffer-overflow': 1}, 'leaked_bytes': 0, \
+'leaked_blocks': 0}
+    >>> parse_memory_errors(
+    ...     'SUMMARY: AddressSanitizer: 24 byte(s) leaked in 2 allocation(s).'
+    ...     ).leaked_bytes
+    24
+    >>> parse_memory_errors(
+    ...     'a.c:3:5: runtime error: signed integer overflow: 1 + 2').errors
+    {'signed integer overflow': 1}
+    >>> parse_memory_errors('==7==    definitely lost: 1,024 bytes in 3 '
+    ...                     'blocks').leaked_blocks
+    3
+
+    :param line: line of output of sanitizers or valgrind
+    """
+    match = _ASAN_ERROR_RE.match(line)
+    if match:
+        return common.MemoryErrors({match.group(1): 1})
+    match = _UBSAN_ERROR_RE.search(line)
+    if match:
+        kind = match.group(1).strip()
+        if not kind or kind[0].isdigit() or "'" in kind:
+            kind = 'undefined behavior'
+        return common.MemoryErrors({kind: 1})
+    match = _VALGRIND_ERROR_RE.match(line)
+    if match:
+        return common.MemoryErrors({match.group(1).lower(): 1})
+    match = _ASAN_LEAK_RE.match(line) or _VALGRIND_LEAK_RE.match(line)
+    if match:
+        leaked_bytes, leaked_blocks = (int(x.replace(',', ''))
+                                       for x in match.groups())
+        return common.MemoryErrors(leaked_bytes=leaked_bytes,
+                                   leaked_blocks=leaked_blocks)
+    return common.MemoryErrors()
+
+
+class LintCommand(common.Command):
+    """Check solutions with clang-tidy, or with compiler warnings."""
+
+    # Diagnostic of clang-tidy or the compiler.
+    _ISSUE_RE = re.compile(r'^[^:\s][^:]*:\d+:\d+: (?:warning|error): ')
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'lint'
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return solution files and the makefile."""
+        return (exercise.solution_files +
+                sorted(exercise.path.glob('[Mm]akefile')) +
+                [exercise.root / '.clang-tidy'])
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return version of the linter."""
+        if shutil.which('clang-tidy'):
+            return common.get_tool_version('clang-tidy', '--version')
+        return common.get_tool_version('cc', '--version')
+
+    def default_jobs(self) -> int:
+        """Return number of processors, as linting is processor bound."""
+        return os.cpu_count() or 1
+
+    def run(self, exercise: Exercise) -> None:
+        """Run the command.
+
+        Sources are compiled with the flags of the makefile, and warnings
+        are treated as errors.
+        """
+        sources = [x.name for x in exercise.solution_files
+                   if x.suffix == '.c']
+        toolchain = get_toolchain(exercise)
+        flags = toolchain.c_flags if toolchain else ['-std=c99']
+        if shutil.which('clang-tidy'):
+            args = ['clang-tidy', '--quiet', '--warnings-as-errors=*',
+                    *sources, '--', *flags]
+        else:
+            cc = toolchain.cc if toolchain else ['cc']
+            args = [*cc, '-fsyntax-only', *flags, '-Wall', '-Wextra',
+                    '-Werror', *sources]
+        issues = 0
+
+        def parse(line: str) -> None:
+            nonlocal issues
+            common.echo(line)
+            if LintCommand._ISSUE_RE.match(line):
+                issues += 1
+
+        result = common.run_process(args, cwd=exercise.path,
+                                    timeout=exercise.namespace.timeout,
+                                    on_line=parse)
+        if issues:
+            common.echo(f'{issues} lint issues')
+        result.check()
+
+
+class Toolchain:
+    """Compiler and flags used by the makefile of an exercise."""
+
+    def __init__(self, cc: list[str], c_flags: list[str], libs: list[str],
+                 asan_flags: list[str]):
+        """Create toolchain.
+
+        :param cc: compiler command
+        :param c_flags: flags for compiling tests
+        :param libs: libraries to link with
+        :param asan_flags: additional flags for compiling memory checks
+        """
+        self.cc = cc
+        self.c_flags = c_flags
+        self.libs = libs
+        self.asan_flags = asan_flags
+
+
+# Source of the test framework vendored in each exercise.
+_FRAMEWORK_SOURCE = 'test-framework/unity.c'
+
+# Variables of the makefile needed to build without make.
+_MAKE_VARIABLES = ['CC', 'CFLAGS', 'LIBS', 'ASANFLAGS']
+
+_object_locks: dict[str, threading.Lock] = {}
+_object_locks_lock = threading.Lock()
+
+
+def get_toolchain(exercise: Exercise) -> Optional[Toolchain]:
+    """Return compiler and flags of an exercise for building without make.
+
+    :param exercise: exercise to build
+    :return: toolchain, or None if the makefile does not build the test
+        framework in the way of the track makefile
+    """
+    makefile = exercise.path / 'makefile'
+    if not makefile.exists():
+        makefile = exercise.path / 'Makefile'
+    try:
+        mtime = os.stat(makefile).st_mtime_ns
+    except OSError:
+        return None
+    if not (exercise.path / _FRAMEWORK_SOURCE).exists():
+        return None
+    return _read_toolchain(makefile, mtime)
+
+
+@functools.lru_cache(maxsize=None)
+def _read_toolchain(makefile: Path, mtime: int) -> Optional[Toolchain]:
+    with makefile.open() as f:
+        if _FRAMEWORK_SOURCE not in f.read():
+            return None
+    with timing.span('make', 'subprocess'):
+        process = subprocess.run(
+            ['make', '-s', '--no-print-directory', '-f', makefile.name,
+             '--eval', 'print-var-%: ; @echo $($*)',
+             *(f'print-var-{x}' for x in _MAKE_VARIABLES)],
+            cwd=makefile.parent, text=True, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+    values = process.stdout.splitlines()
+    if process.returncode or len(values) != len(_MAKE_VARIABLES):
+        return None
+    cc, c_flags, libs, asan_flags = (shlex.split(x) for x in values)
+    return Toolchain(cc or ['cc'], c_flags, libs, asan_flags)
+
+
+def get_framework_object(exercise: Exercise, cc: list[str],
+                         flags: list[str]) -> Path:
+    """Return the test framework compiled to an object file.
+
+    Objects are shared by all exercises, keyed by the compiler, flags and
+    sources of the framework, and compiled only by the first build needing
+    them.
+
+    :param exercise: exercise with the vendored test framework
+    :param cc: compiler command
+    :param flags: compiler flags
+    """
+    framework = exercise.path / _FRAMEWORK_SOURCE
+    digest = hashlib.sha256()
+    for value in (shlex.join(cc), common.get_tool_version(cc[0], '--version'),
+                  shlex.join(flags)):
+        digest.update(value.encode() + b'\0')
+    # Framework files are digested by name only, as every exercise vendors
+    # its own copy of them.
+    for file in sorted(framework.parent.glob('*.[ch]')):
+        digest.update(file.name.encode() + b'\0')
+        digest.update(hashlib.sha256(file.read_bytes()).digest())
+    key = digest.hexdigest()
+    path = workspace.get_state_dir() / 'c-objects' / f'{key}.o'
+    with _object_locks_lock:
+        lock = _object_locks.setdefault(key, threading.Lock())
+    with lock:
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f'{key}.{os.getpid()}.tmp.o')
+        try:
+            with timing.span('test framework', 'compile'):
+                common.check_call([*cc, *flags, '-c', str(framework),
+                                   '-o', str(temp)],
+                                  cwd=exercise.path,
+                                  timeout=exercise.namespace.timeout)
+            os.replace(temp, path)
+        finally:
+            temp.unlink(missing_ok=True)
+    return path
+
+
+def _is_newer(output: Path) -> bool:
+    try:
+        mtime = os.stat(output).st_mtime_ns
+    except OSError:
+        return False
+    return all(x.stat().st_mtime_ns <= mtime
+               for name in ('*.c', '*.h') for x in output.parent.glob(name))
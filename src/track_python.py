@@ -1,8 +1,20 @@
 """Operations for the Python track on Exercism."""
 
-import subprocess
+import contextlib
+import importlib.metadata
+import importlib.util
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import IO, Optional, Union
 
 import common
+import history
+import timing
+import workspace
 from exercise import Exercise
 
 
@@ -17,7 +29,7 @@ class PythonTrack(common.Track):
     @property
     def commands(self) -> list[common.Command]:
         """List of commands specific to this track."""
-        return [InitCommand(), TestCommand()]
+        return [InitCommand(), TestCommand(), LintCommand()]
 
     def post_download(self, exercise: Exercise) -> None:
         """Prepare solution for for niceties."""
@@ -34,25 +46,288 @@ class InitCommand(common.Command):
 
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
+        with timing.span('docstrings', 'init'):
+            self.__init_docstrings(exercise)
+
+    def __init_docstrings(self, exercise: Exercise) -> None:
         for file in exercise.solution_files:
             with file.open('r') as f:
                 lines = f.readlines()
             if lines and not lines[0].startswith('"""'):
                 lines.insert(0, f'"""Solve {exercise.name} on Exercism."""\n')
                 lines.insert(1, '\n')
-                with file.open('w') as f:
-                    f.writelines(lines)
+                common.write_file(file, ''.join(lines))
 
 
 class TestCommand(common.Command):
     """Run tests using pytest."""
 
-    @ property
+    # Exit codes of pytest when the session could not run tests.
+    _SESSION_ERRORS = [3, 4]
+
+    @property
     def name(self) -> str:
         """Return the name of the command."""
         return 'test'
 
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add pytest arguments."""
+        parser.add_argument('-n', '--numprocesses', type=int,
+                            help='number of test processes with pytest-xdist')
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return solution and test files."""
+        return exercise.solution_files + exercise.test_files
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return python and pytest versions."""
+        return sys.version + _get_version('pytest')
+
+    def can_run_many(self) -> bool:
+        """Run tests of all exercises in a single pytest session."""
+        return True
+
     def run(self, exercise: Exercise) -> None:
         """Run the command."""
-        for test in exercise.test_files:
-            subprocess.check_call(['python', '-m', 'pytest', test])
+        [error] = self.run_many([exercise])
+        if error:
+            raise common.Failed(error)
+
+    def run_many(self, exercises: list[Exercise]) -> list[Optional[str]]:
+        """Run tests for all exercises in as few pytest sessions as possible.
+
+        Exercises with conflicting module names run in separate sessions.
+        If a session cannot be started, test files are run one by one.
+        """
+        errors: dict[int, Optional[str]] = {}
+        for session in _get_sessions(exercises):
+            errors.update(self.__run_session(session))
+        return [errors[id(x)] for x in exercises]
+
+    def __get_pytest_args(self, exercise: Exercise) -> list[str]:
+        args = [sys.executable, '-m', 'pytest']
+        workers = exercise.namespace.numprocesses
+        if workers:
+            if importlib.util.find_spec('xdist'):
+                args.extend(['-n', str(workers)])
+            else:
+                common.echo('pytest-xdist is not installed, '
+                            'running tests serially')
+        return args
+
+    def __run_session(self, exercises: list[Exercise]
+                      ) -> dict[int, Optional[str]]:
+        root = exercises[0].root
+        files = [str(x) for e in exercises for x in e.test_files]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = Path(tmp_dir) / 'report.xml'
+            result = common.run_process(
+                self.__get_pytest_args(exercises[0]) +
+                [f'--rootdir={root}', f'--junitxml={report}'] + files,
+                timeout=exercises[0].namespace.timeout)
+            if result.timed_out:
+                return {id(x): result.error for x in exercises}
+            for exercise in exercises:
+                common.record_exit_status(exercise, result.returncode)
+            if result.returncode in TestCommand._SESSION_ERRORS or \
+                    not report.exists():
+                return self.__run_files(exercises)
+            outcomes = parse_junit_report(report)
+        errors: dict[int, Optional[str]] = {}
+        for exercise in exercises:
+            prefix = '.'.join(exercise.path.relative_to(root).parts) + '.'
+            cases = [x for x in outcomes if x[0].startswith(prefix)]
+            results = [x for _, _, x, _ in cases]
+            history.record(exercise, {
+                f'{c[len(prefix):]}::{n}': t for c, n, x, t in cases
+                if x != 'skipped'})
+            counts = common.TestCounts(passed=results.count('passed'),
+                                       failed=results.count('failed'),
+                                       ignored=results.count('skipped'),
+                                       duration=sum(x[3] for x in cases))
+            if not results:
+                errors[id(exercise)] = 'no tests ran'
+                continue
+            common.record_tests(exercise, counts)
+            if counts.failed:
+                errors[id(exercise)] = f'{counts.failed} tests failed'
+            else:
+                errors[id(exercise)] = None
+        return errors
+
+    def __run_files(self, exercises: list[Exercise]
+                    ) -> dict[int, Optional[str]]:
+        errors: dict[int, Optional[str]] = {}
+        for exercise in exercises:
+            failed = 0
+            for test in exercise.test_files:
+                result = common.run_process(
+                    self.__get_pytest_args(exercise) + [str(test)],
+                    timeout=exercise.namespace.timeout)
+                if result.timed_out:
+                    errors[id(exercise)] = result.error
+                    break
+                if result.returncode:
+                    failed += 1
+                    common.record_exit_status(exercise, result.returncode)
+            else:
+                errors[id(exercise)] = (f'{failed} test files failed'
+                                        if failed else None)
+        return errors
+
+
+class LintCommand(common.Command):
+    """Check solutions with flake8, pydocstyle and mypy."""
+
+    _LINTERS = ['flake8', 'pydocstyle', 'mypy']
+
+    # Start of a reported issue, following lines belong to the same issue.
+    _ISSUE_RE = re.compile(r'^(.+?\.py):\d+(?!.*: note: )')
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'lint'
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return solution files and linter configs of the workspace."""
+        return exercise.solution_files + [
+            exercise.root / x for x in ['setup.cfg', 'tox.ini', '.flake8',
+                                        '.pydocstyle', 'mypy.ini']]
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return python and linter versions."""
+        return sys.version + ' '.join(_get_version(x)
+                                      for x in LintCommand._LINTERS)
+
+    def can_run_many(self) -> bool:
+        """Lint all exercises with a single call of each linter."""
+        return True
+
+    def run(self, exercise: Exercise) -> None:
+        """Run the command."""
+        [error] = self.run_many([exercise])
+        if error:
+            raise common.Failed(error)
+
+    def run_many(self, exercises: list[Exercise]) -> list[Optional[str]]:
+        """Run linters concurrently, each over solutions of all exercises.
+
+        mypy runs separately for exercises with conflicting module names.
+        Issues are attributed to exercises by the file they are reported
+        for.
+        """
+        files = {str(x): i for i, e in enumerate(exercises)
+                 for x in e.solution_files if x.suffix == '.py'}
+        calls = []
+        for linter in LintCommand._LINTERS:
+            if not importlib.util.find_spec(linter):
+                common.echo(f'{linter} is not installed, skipping')
+            elif linter == 'mypy':
+                for session in _get_sessions(exercises):
+                    calls.append(self.__get_args(linter, [
+                        str(x) for e in session for x in e.solution_files
+                        if str(x) in files]))
+            else:
+                calls.append(self.__get_args(linter, list(files)))
+        issues = [0] * len(exercises)
+        failures: list[str] = []
+        scope = common.get_cancel_scope()
+
+        def lint(args: list[str]) -> None:
+            lines: list[str] = []
+            with scope or contextlib.nullcontext():
+                result = common.run_process(
+                    args, cwd=exercises[0].root,
+                    timeout=exercises[0].namespace.timeout,
+                    on_line=lines.append)
+            if lines:
+                common.echo('\n'.join(lines))
+            found = 0
+            for line in lines:
+                match = LintCommand._ISSUE_RE.match(line)
+                if match and match.group(1) in files:
+                    issues[files[match.group(1)]] += 1
+                    found += 1
+            if result.timed_out or result.returncode and not found:
+                failures.append(f'{args[2]} {result.error}')
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(calls) or 1) as executor:
+            for future in [executor.submit(lint, x) for x in calls]:
+                future.result()
+        if failures:
+            return [', '.join(failures)] * len(exercises)
+        return [f'{x} lint issues' if x else None for x in issues]
+
+    def __get_args(self, linter: str, files: list[str]) -> list[str]:
+        args = [sys.executable, '-m', linter]
+        if linter == 'mypy':
+            args.extend(['--cache-dir',
+                         str(workspace.get_state_dir() / 'mypy')])
+        return args + files
+
+
+def parse_junit_report(report: Union[Path, IO[str]]
+                       ) -> list[tuple[str, str, str, float]]:
+    """Return class name, name, outcome and seconds of test cases.
+
+    >>> import io
+    >>> for case in parse_junit_report(io.StringIO(
+    ...         '<?xml version="1.0" encoding="utf-8"?>'
+    ...         '<testsuites name="pytest tests"><testsuite name="pytest" '
+    ...         'errors="0" failures="1" skipped="1" tests="3" time="0.034">'
+    ...         '<testcase classname="python.beta.beta_test" name="test_b" '
+    ...         'time="0.012"><failure message="assert 2 == 3">'
+    ...         'python/beta/beta_test.py:4: AssertionError</failure>'
+    ...         '</testcase><testcase classname="python.beta.beta_test" '
+    ...         'name="test_c" time="0.000" /><testcase '
+    ...         'classname="python.beta.beta_test" name="test_d" time="0.000">'
+    ...         '<skipped type="pytest.skip" message="slow">'
+    ...         'python/beta/beta_test.py:9: slow</skipped></testcase>'
+    ...         '</testsuite></testsuites>')):
+    ...     print(case)
+    ('python.beta.beta_test', 'test_b', 'failed', 0.012)
+    ('python.beta.beta_test', 'test_c', 'passed', 0.0)
+    ('python.beta.beta_test', 'test_d', 'skipped', 0.0)
+
+    :param report: JUnit XML report written by pytest
+    """
+    tree = ElementTree.parse(report)
+    results = []
+    for case in tree.iter('testcase'):
+        if case.find('failure') is not None or \
+                case.find('error') is not None:
+            outcome = 'failed'
+        elif case.find('skipped') is not None:
+            outcome = 'skipped'
+        else:
+            outcome = 'passed'
+        results.append((case.get('classname', ''),
+                        case.get('name', ''), outcome,
+                        float(case.get('time') or 0)))
+    return results
+
+
+def _get_version(package: str) -> str:
+    """Return name and version of an installed package, without running it."""
+    try:
+        return f'{package} {importlib.metadata.version(package)}'
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+def _get_sessions(exercises: list[Exercise]) -> list[list[Exercise]]:
+    """Group exercises so that module names do not conflict in a group."""
+    sessions: list[tuple[set[str], list[Exercise]]] = []
+    for exercise in exercises:
+        modules = {x.stem for x in
+                   exercise.solution_files + exercise.test_files}
+        for names, session in sessions:
+            if not names & modules:
+                names.update(modules)
+                session.append(exercise)
+                break
+        else:
+            sessions.append((modules, [exercise]))
+    return [x for _, x in sessions]
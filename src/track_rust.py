@@ -1,14 +1,18 @@
 """Operations for the Rust track on Exercism."""
 
 import json
-import subprocess
+import re
+import threading
 from argparse import ArgumentParser
 from pathlib import Path
-from typing import Any, MutableMapping
+from typing import Any, MutableMapping, Optional
 
 import toml
 
 import common
+import history
+import timing
+import workspace
 from exercise import Exercise
 
 
@@ -26,8 +30,11 @@ class RustTrack(common.Track):
         return [InitCommand(),
                 CargoCommand('build'),
                 CargoCommand('check'),
-                CargoCommand('test', '--', '--include-ignored'),
+                CargoCommand('test', '--', '--include-ignored',
+                             incremental=True),
                 CargoCommand('clean', support_features=False),
+                CargoCommand('lint', '--', '-D', 'warnings',
+                             subcommand='clippy', incremental=True),
                 CargoCommand('doc', '--open')]
 
     def get_additional_solution_files(self, exercise: Exercise) -> list[Path]:
@@ -44,6 +51,9 @@ class InitCommand(common.Command):
 
     _LINTS = ['#![warn(clippy::all)]\n', '#![warn(missing_docs)]\n']
 
+    # Workspace manifest and launch config are shared by all exercises.
+    _WORKSPACE_LOCK = threading.Lock()
+
     @property
     def name(self) -> str:
         """Name of the command."""
@@ -55,22 +65,21 @@ class InitCommand(common.Command):
             config = toml.load(f)
         if config['package']['name'] != exercise.name:
             config['package']['name'] = exercise.name
-            with config_file.open('w') as f:
-                toml.dump(config, f)
+            common.write_file(config_file, toml.dumps(config))
 
     def __init_workspace(self, exercise: Exercise) -> None:
         rust_dir = exercise.root / 'rust'
-        dirs = [x for x in rust_dir.iterdir() if x.is_dir()]
+        members = sorted(f'rust/{x.name}' for x in rust_dir.iterdir()
+                         if (x / 'Cargo.toml').is_file())
         config_file = exercise.root / 'Cargo.toml'
-        config: MutableMapping[str, Any]
+        config: MutableMapping[str, Any] = {}
         if config_file.exists():
             with config_file.open('r') as f:
                 config = toml.load(f)
-        config = config or {'workspace': {'members': []}}
-        if set(dirs) != set(config.get('workspace', {}).get('members', [])):
-            config['workspace']['members'] = [f'rust/{x.name}' for x in dirs]
-            with config_file.open('w') as f:
-                toml.dump(config, f)
+        workspace_config = config.setdefault('workspace', {})
+        if sorted(workspace_config.get('members', [])) != members:
+            workspace_config['members'] = members
+            common.write_file(config_file, toml.dumps(config))
 
     def __init_launch(self, exercise: Exercise) -> None:
         config_dir = exercise.root / '.vscode'
@@ -82,8 +91,7 @@ class InitCommand(common.Command):
             if 'cargo' in config:
                 config['cargo'].get('args', []).append(
                     f'--package={exercise.name}')
-        with config_file.open('w') as f:
-            json.dump(launch, f, indent=4)
+        common.write_file(config_file, json.dumps(launch, indent=4))
 
     def __init_lints(self, exercise: Exercise) -> None:
         file = exercise.find_file('src/*.rs')
@@ -102,31 +110,75 @@ class InitCommand(common.Command):
             out_lines.extend(lints)
             out_lines.append('\n')
         out_lines.extend(lines)
-        if lines != out_lines:
-            with file.open('w') as f:
-                f.writelines(out_lines)
+        common.write_file(file, ''.join(out_lines))
+
+    def __get_stamp_file(self, exercise: Exercise) -> Path:
+        path = exercise.path.relative_to(exercise.root)
+        return (workspace.get_state_dir() / 'rust-init' /
+                path.parent / f'{path.name}.stamp')
+
+    def __get_stamp(self, exercise: Exercise) -> str:
+        files = [exercise.path / 'Cargo.toml',
+                 exercise.root / 'rust',
+                 exercise.root / 'Cargo.toml',
+                 exercise.root / '.vscode' / 'launch.json',
+                 exercise.root / '.vscode' / 'launch.json.template']
+        stamp = []
+        for file in files:
+            try:
+                stat = file.stat()
+                stamp.append(f'{file} {stat.st_mtime_ns} {stat.st_size}\n')
+            except OSError:
+                stamp.append(f'{file} missing\n')
+        return ''.join(stamp)
 
     def run(self, exercise: Exercise) -> None:
-        """Run the command."""
-        self.__init_package(exercise)
-        self.__init_workspace(exercise)
-        self.__init_launch(exercise)
-        self.__init_lints(exercise)
+        """Run the command.
+
+        Manifests and launch config are not read if none of them changed
+        since the last run for this exercise, so that running again after
+        editing the solution only checks its lints.
+        """
+        stamp_file = self.__get_stamp_file(exercise)
+        try:
+            initialized = stamp_file.read_text() == self.__get_stamp(exercise)
+        except OSError:
+            initialized = False
+        if not initialized:
+            with timing.span('package', 'init'):
+                self.__init_package(exercise)
+            with InitCommand._WORKSPACE_LOCK:
+                with timing.span('workspace', 'init'):
+                    self.__init_workspace(exercise)
+                with timing.span('launch', 'init'):
+                    self.__init_launch(exercise)
+                stamp_file.parent.mkdir(parents=True, exist_ok=True)
+                common.write_file(stamp_file, self.__get_stamp(exercise))
+        with timing.span('lints', 'init'):
+            self.__init_lints(exercise)
 
 
 class CargoCommand(common.Command):
     """Run a cargo command."""
 
-    def __init__(self, name: str, *args: str, support_features: bool = True):
+    # Subcommands accepting many packages, json messages and a job limit.
+    _MANY_SUBCOMMANDS = ['build', 'check', 'test', 'clippy', 'doc']
+
+    def __init__(self, name: str, *args: str, support_features: bool = True,
+                 incremental: bool = False, subcommand: Optional[str] = None):
         """Create make command.
 
-        :param name: name of the cargo command
+        :param name: name of the command
         :param args: extra arguments for cargo
         :param support_features: allow feature management
+        :param incremental: skip when sources did not change since last pass
+        :param subcommand: cargo command to run, same as the name by default
         """
         self._name = name
+        self._subcommand = subcommand or name
         self._args = args
         self._support_features = support_features
+        self._incremental = incremental
 
     @property
     def name(self) -> str:
@@ -142,16 +194,259 @@ class CargoCommand(common.Command):
             parser.add_argument('--all-features', default=False,
                                 action='store_true',
                                 help='enable all features')
+        parser.add_argument('--target-dir', type=Path,
+                            help='directory for build artifacts, shared by '
+                                 'all exercises by default')
+        parser.add_argument('--sccache', default=False, action='store_true',
+                            help='cache compilations with sccache')
+        parser.add_argument('--no-incremental', default=False,
+                            action='store_true',
+                            help='disable incremental compilation')
+        if self.name == 'test':
+            parser.add_argument('--durations', default=False,
+                                action='store_true',
+                                help='keep durations of each test, with '
+                                     'unstable options of the test harness '
+                                     'that rebuild tests')
+
+    def get_inputs(self, exercise: Exercise) -> Optional[list[Path]]:
+        """Return sources, tests and the package manifest."""
+        if not self._incremental:
+            return None
+        return (exercise.solution_files + exercise.test_files +
+                sorted((exercise.path / 'src').glob('**/*.rs')))
+
+    def get_fingerprint(self, exercise: Exercise) -> str:
+        """Return cargo and compiler versions with selected features."""
+        return (common.get_tool_version('cargo', '--version') +
+                common.get_tool_version('rustc', '--version') +
+                ' '.join(self.__get_args(exercise)))
+
+    def max_jobs(self) -> Optional[int]:
+        """Run one cargo at a time as they lock the shared target dir."""
+        return 1
+
+    def can_run_many(self) -> bool:
+        """Run all packages with a single cargo call, if cargo allows."""
+        return self._subcommand in CargoCommand._MANY_SUBCOMMANDS
 
     def run(self, exercise: Exercise) -> None:
-        """Run the command."""
+        """Run the command.
+
+        Tests are run the same way as for many exercises, so that their
+        counts are parsed from the output.
+        """
+        if self.name == 'test':
+            [error] = self.run_many([exercise])
+            if error:
+                raise common.Failed(error)
+            return
         # Set the current exercise a default.
         InitCommand().run(exercise)
-        args = ['--package', exercise.name]
+        common.check_call(['cargo', self._subcommand] +
+                          self.__get_args(exercise),
+                          cwd=exercise.root, env=self.__get_env(exercise),
+                          timeout=exercise.namespace.timeout)
+
+    def run_many(self, exercises: list[Exercise]) -> list[Optional[str]]:
+        """Run the command for all packages with a single cargo call.
+
+        Results of each package are parsed from the json messages of cargo
+        and the test harness output.
+        """
+        for exercise in exercises:
+            InitCommand().run(exercise)
+        args = ['cargo', self._subcommand, '--message-format=json']
+        for exercise in exercises:
+            args.extend(['--package', exercise.name])
+        if self.name == 'test':
+            args.append('--no-fail-fast')
+        if exercises[0].namespace.jobs:
+            args.extend(['--jobs', str(exercises[0].namespace.jobs)])
+        args.extend(self.__get_args(exercises[0], package=False))
+        report = _CargoReport(exercises, runs_tests=self.name == 'test')
+        result = common.run_process(args, cwd=exercises[0].root,
+                                    env=self.__get_env(exercises[0]),
+                                    timeout=exercises[0].namespace.timeout,
+                                    on_line=report.parse)
+        for exercise, counts in zip(exercises, report.get_tests()):
+            if counts:
+                common.record_tests(exercise, counts)
+        for exercise, durations in zip(exercises, report.get_durations()):
+            history.record(exercise, durations)
+        if result.timed_out:
+            return report.get_errors(result.returncode, result.error)
+        for exercise in exercises:
+            common.record_exit_status(exercise, result.returncode)
+        return report.get_errors(result.returncode)
+
+    def __get_args(self, exercise: Exercise,
+                   package: bool = True) -> list[str]:
+        args = ['--package', exercise.name] if package else []
         if self._support_features:
             if exercise.namespace.features:
                 args.extend(['--features', exercise.namespace.features])
             if exercise.namespace.all_features:
                 args.extend(['--all-features'])
         args.extend(self._args)
-        subprocess.check_call(['cargo', self.name] + args, cwd=exercise.root)
+        if self.__measures_durations(exercise):
+            args.extend(['-Z', 'unstable-options', '--report-time'])
+        return args
+
+    def __get_env(self, exercise: Exercise) -> dict[str, str]:
+        env = {}
+        if exercise.namespace.target_dir:
+            env['CARGO_TARGET_DIR'] = str(
+                exercise.namespace.target_dir.absolute())
+        if exercise.namespace.sccache:
+            env['RUSTC_WRAPPER'] = 'sccache'
+        if exercise.namespace.no_incremental:
+            env['CARGO_INCREMENTAL'] = '0'
+        if self.__measures_durations(exercise):
+            # Allows unstable options of the test harness on stable Rust.
+            env['RUSTC_BOOTSTRAP'] = '1'
+        return env
+
+    def __measures_durations(self, exercise: Exercise) -> bool:
+        return getattr(exercise.namespace, 'durations', False)
+
+
+class _CargoReport:
+    """Per package results parsed from output of a cargo call.
+
+    >>> import contextlib, io
+    >>> from types import SimpleNamespace
+    >>> report = _CargoReport(
+    ...     [SimpleNamespace(path=Path('/ws/rust/ra'), name='ra'),
+    ...      SimpleNamespace(path=Path('/ws/rust/rb'), name='rb')],
+    ...     runs_tests=True)
+    >>> with contextlib.redirect_stdout(io.StringIO()):
+    ...     for line in [
+    ...             '{"reason":"compiler-message",'
+    ...             '"manifest_path":"/ws/rust/rb/Cargo.toml","message":{'
+    ...             '"level":"error","message":"cannot find value `x` in '
+    ...             'this scope","rendered":"error[E0425]: cannot find '
+    ...             'value `x` in this scope"}}',
+    ...             '{"reason":"compiler-artifact",'
+    ...             '"manifest_path":"/ws/rust/ra/Cargo.toml",'
+    ...             '"executable":"/ws/target/debug/deps/ra-6fd534f54af3b17d"'
+    ...             '}',
+    ...             '     Running tests/ra.rs '
+    ...             '(target/debug/deps/ra-6fd534f54af3b17d)',
+    ...             'test t ... ok <0.001s>',
+    ...             'test u ... FAILED <0.120s>',
+    ...             'test result: FAILED. 1 passed; 1 failed; 1 ignored; '
+    ...             '0 measured; 0 filtered out; finished in 0.12s',
+    ...             '   Doc-tests ra',
+    ...             'test result: ok. 1 passed; 0 failed; 0 ignored; '
+    ...             '0 measured; 0 filtered out; finished in 0.00s']:
+    ...         report.parse(line)
+    >>> [vars(x) if x else None for x in report.get_tests()]
+    [{'passed': 2, 'failed': 1, 'ignored': 1, 'duration': 0.12}, None]
+    >>> report.get_durations()
+    [{'t': 0.001, 'u': 0.12}, {}]
+    >>> report.get_errors(101)
+    ['1 tests failed', '1 build errors']
+    """
+
+    _RUNNING_RE = re.compile(r'^\s*Running .*?\(?([^\s()]+)\)?$')
+    _DOC_TESTS_RE = re.compile(r'^\s*Doc-tests (\S+)$')
+    _RESULT_RE = re.compile(
+        r'^test result: \w+\. (\d+) passed; (\d+) failed; (\d+) ignored'
+        r'.*?(?:; finished in ([\d.]+)s)?$')
+    _TEST_RE = re.compile(r'^test (.+?) \.\.\. \w+ <([\d.]+)s>$')
+
+    def __init__(self, exercises: list[Exercise], runs_tests: bool):
+        """Create an empty report for the packages of the exercises.
+
+        :param exercises: exercises of the packages
+        :param runs_tests: whether cargo runs tests of the packages
+        """
+        self._exercises = exercises
+        self._runs_tests = runs_tests
+        self._paths = {x.path.resolve(): i for i, x in enumerate(exercises)}
+        self._crates = {x.name.replace('-', '_'): i
+                        for i, x in enumerate(exercises)}
+        self._executables: dict[str, int] = {}
+        self._current: Optional[int] = None
+        self._build_errors = [0] * len(exercises)
+        self._tests: list[Optional[common.TestCounts]] = [None] * len(
+            exercises)
+        self._durations: list[dict[str, float]] = [{} for _ in exercises]
+
+    def parse(self, line: str) -> None:
+        """Parse and print a line of output."""
+        if line.startswith('{'):
+            try:
+                self.__parse_message(json.loads(line))
+                return
+            except ValueError:
+                pass
+        common.echo(line)
+        match = _CargoReport._RUNNING_RE.match(line)
+        if match:
+            self._current = self._executables.get(Path(match[1]).name)
+            return
+        match = _CargoReport._DOC_TESTS_RE.match(line)
+        if match:
+            self._current = self._crates.get(match[1])
+            return
+        match = _CargoReport._TEST_RE.match(line)
+        if match and self._current is not None:
+            self._durations[self._current][match[1]] = float(match[2])
+            return
+        match = _CargoReport._RESULT_RE.match(line)
+        if match and self._current is not None:
+            passed, failed, ignored = (int(x) for x in match.groups()[:3])
+            duration = float(match[4]) if match[4] else None
+            tests = self._tests[self._current] or common.TestCounts()
+            tests.add(common.TestCounts(passed, failed, ignored, duration))
+            self._tests[self._current] = tests
+
+    def get_tests(self) -> list[Optional[common.TestCounts]]:
+        """Return test counts of each package, or None if none ran."""
+        return self._tests
+
+    def get_durations(self) -> list[dict[str, float]]:
+        """Return seconds of each test by name for each package."""
+        return self._durations
+
+    def get_errors(self, returncode: int,
+                   timeout: Optional[str] = None) -> list[Optional[str]]:
+        """Return error for each package, or None if it passed.
+
+        :param returncode: exit status of cargo
+        :param timeout: error of packages whose tests did not finish, if
+                        cargo was killed for its timeout
+        """
+        errors: list[Optional[str]] = []
+        for i, tests in enumerate(self._tests):
+            if timeout and (not tests or i == self._current):
+                errors.append(timeout)
+            elif self._build_errors[i]:
+                errors.append(f'{self._build_errors[i]} build errors')
+            elif tests and tests.failed:
+                errors.append(f'{tests.failed} tests failed')
+            elif returncode and self._runs_tests and not tests:
+                errors.append('tests did not run')
+            else:
+                errors.append(None)
+        if returncode and not any(errors):
+            return [f'exit status {returncode}'] * len(errors)
+        return errors
+
+    def __parse_message(self, message: dict[str, Any]) -> None:
+        manifest = message.get('manifest_path')
+        package = (self._paths.get(Path(manifest).parent.resolve())
+                   if manifest else None)
+        if message.get('reason') == 'compiler-artifact':
+            if message.get('executable') and package is not None:
+                self._executables[Path(message['executable']).name] = package
+        elif message.get('reason') == 'compiler-message':
+            diagnostic = message.get('message', {})
+            if diagnostic.get('rendered'):
+                common.echo(diagnostic['rendered'].rstrip('\n'))
+            if diagnostic.get('level') == 'error' and package is not None \
+                    and not diagnostic.get('message', '').startswith(
+                        'aborting due to'):
+                self._build_errors[package] += 1
@@ -0,0 +1,108 @@
+"""Run a command again whenever files of an exercise change."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional
+
+import batch
+import common
+from exercise import Exercise
+
+Snapshot = dict[Path, Optional[tuple[int, int, int]]]
+
+
+class WatchCommand(common.Command):
+    """Run tests again whenever solution or test files change."""
+
+    def __init__(self, command: common.Command):
+        """Create watch command.
+
+        :param command: command to run on changes, such as test
+        """
+        self._command = command
+
+    @property
+    def name(self) -> str:
+        """Name of the command."""
+        return 'watch'
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add arguments of the watched command and polling options."""
+        self._command.add_arguments(parser)
+        parser.add_argument('--interval', type=float, default=0.2,
+                            help='seconds between checks for changes')
+        parser.add_argument('--debounce', type=float, default=0.3,
+                            help='seconds files should stay unchanged '
+                                 'before running')
+
+    def run(self, exercise: Exercise) -> None:
+        """Run the command and then again on every change until interrupted.
+
+        A run still in progress is cancelled when a new change arrives.
+        """
+        namespace = exercise.namespace
+        snapshot = get_snapshot(self.__get_files(exercise))
+        scope, worker = self.__start(exercise)
+        try:
+            while True:
+                time.sleep(namespace.interval)
+                current = get_snapshot(self.__get_files(exercise))
+                if current == snapshot:
+                    continue
+                while True:
+                    time.sleep(namespace.debounce)
+                    latest = get_snapshot(self.__get_files(exercise))
+                    if latest == current:
+                        break
+                    current = latest
+                snapshot = current
+                if worker.is_alive():
+                    scope.cancel()
+                    worker.join()
+                scope, worker = self.__start(exercise)
+        except KeyboardInterrupt:
+            scope.cancel()
+            worker.join()
+
+    def __get_files(self, exercise: Exercise) -> list[Path]:
+        return exercise.solution_files + exercise.test_files
+
+    def __start(self, exercise: Exercise
+                ) -> tuple[common.CancelScope, threading.Thread]:
+        scope = common.CancelScope()
+        worker = threading.Thread(target=self.__run, args=(exercise, scope),
+                                  daemon=True)
+        worker.start()
+        return scope, worker
+
+    def __run(self, exercise: Exercise, scope: common.CancelScope) -> None:
+        with scope:
+            result = batch.run_one(self._command, exercise)
+        if scope.cancelled:
+            common.echo(f'{exercise}: {self._command} cancelled')
+            return
+        status = 'PASS' if result.passed else 'FAIL'
+        line = f'{status}  {exercise}  ({result.duration:.1f}s)'
+        if result.error:
+            line += f'  {result.error}'
+        common.echo(f'{line}\nwatching for changes, press Ctrl-C to stop')
+
+
+def get_snapshot(files: list[Path]) -> Snapshot:
+    """Return inode, modification time and size of files.
+
+    :param files: files to check, missing files are recorded as None
+    """
+    snapshot: Snapshot = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+            snapshot[file] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            snapshot[file] = None
+    return snapshot
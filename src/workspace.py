@@ -0,0 +1,117 @@
+"""Location of the local Exercism workspace."""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import timing
+
+
+def get_root() -> Path:
+    """Return the Exercism solutions root.
+
+    The Exercism CLI is asked at most once per process as long as its
+    configuration does not change. Results are also kept in a cache file
+    keyed on the modification time of the CLI configuration, so that repeat
+    invocations do not need to start the CLI at all.
+    """
+    config_file = get_config_file()
+    return _resolve_root(config_file, _get_mtime(config_file))
+
+
+def get_state_dir() -> Path:
+    """Return the directory for state kept by this script in the workspace."""
+    return get_root() / '.manage'
+
+
+def get_track_dir(track: str, user: Optional[str] = None) -> Path:
+    """Return the directory holding all solutions of a track.
+
+    :param track: name of the track
+    :param user: user of the solutions if different from current user
+    """
+    return (get_root() /
+            (Path('users') / user if user else '') /
+            track)
+
+
+def list_exercises(track: str, user: Optional[str] = None) -> list[str]:
+    """Return slugs of all exercises present locally for a track.
+
+    :param track: name of the track
+    :param user: user of the solutions if different from current user
+    """
+    track_dir = get_track_dir(track, user)
+    if not track_dir.is_dir():
+        return []
+    return sorted(x.name for x in track_dir.iterdir()
+                  if x.is_dir() and not x.name.startswith('.'))
+
+
+def get_config_file() -> Path:
+    """Return the configuration file of the Exercism CLI."""
+    config_home = os.environ.get('EXERCISM_CONFIG_HOME')
+    if config_home:
+        return Path(config_home) / 'user.json'
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME')
+    config_dir = (Path(xdg_config_home) if xdg_config_home
+                  else Path.home() / '.config')
+    return config_dir / 'exercism' / 'user.json'
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Return the directory for caches outside the workspace.
+
+    :return: cache directory, or None if disk caches are disabled
+    """
+    if os.environ.get('EXERCISM_MANAGER_NO_CACHE'):
+        return None
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    cache_dir = (Path(xdg_cache_home) if xdg_cache_home
+                 else Path.home() / '.cache')
+    return cache_dir / 'exercism-manager'
+
+
+def _get_mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_root(config_file: Path, config_mtime: Optional[int]) -> Path:
+    with timing.span('resolve root', 'workspace'):
+        return _read_root(config_file, config_mtime)
+
+
+def _read_root(config_file: Path, config_mtime: Optional[int]) -> Path:
+    cache_dir = get_cache_dir()
+    cache_file = cache_dir / 'workspace.json' if cache_dir else None
+    if cache_file and config_mtime is not None:
+        try:
+            with cache_file.open() as f:
+                cache = json.load(f)
+            if cache.get('config_file') == str(config_file) and \
+                    cache.get('config_mtime') == config_mtime:
+                return Path(cache['workspace'])
+        except (OSError, ValueError, KeyError):
+            pass
+    with timing.span('exercism', 'subprocess'):
+        root = Path(subprocess.check_output(
+            ['exercism', 'workspace'], text=True).strip())
+    if cache_file and config_mtime is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with cache_file.open('w') as f:
+                json.dump({'config_file': str(config_file),
+                           'config_mtime': config_mtime,
+                           'workspace': str(root)}, f)
+        except OSError:
+            pass
+    return root